@@ -0,0 +1,307 @@
+"""Streaming accumulators for disorder averages of metrics outputs
+
+Each accumulator takes one realization at a time with add() and keeps a fixed
+amount of memory no matter how many realizations are added. Accumulators are
+elementwise by default; pooled accumulators collect the finite values of every
+realization into a single distribution, e.g. the level spacings for P(s). Ensemble runs a
+realization function repeatedly and checkpoints the accumulators and the numpy
+random state to disk so an interrupted ensemble resumes where it stopped.
+"""
+
+import numpy as np
+import os
+import pickle
+
+
+class RunningStats:
+    def __init__(self, pooled=False):
+        """Elementwise running mean and variance using Welford's algorithm
+        Args:
+            pooled: bool, True for the mean and variance of all values added; each
+                realization is flattened and nan and inf are skipped
+        """
+        self.pooled = pooled
+        self.count = 0
+        self.mean = None
+        self._m2 = None
+
+    def add(self, x):
+        """Adds one realization; x is a float or array with the same shape every call
+        unless pooled"""
+        x = np.asarray(x, dtype=float)
+        if self.pooled:
+            x = x[np.isfinite(x)]
+            if len(x):
+                batch = RunningStats()
+                batch.count, batch.mean = len(x), np.array(np.mean(x))
+                batch._m2 = np.array(np.sum((x - batch.mean)**2))
+                self.merge(batch)
+            return
+        if self.mean is None:
+            self.mean = np.zeros_like(x)
+            self._m2 = np.zeros_like(x)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        """Combines the statistics of another RunningStats into this one"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self._m2 = other.count, other.mean.copy(), other._m2.copy()
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / count
+        self._m2 = self._m2 + other._m2 + delta**2 * self.count * other.count / count
+        self.count = count
+
+    @property
+    def var(self):
+        """Population variance, same as np.var"""
+        return self._m2 / self.count
+
+    @property
+    def std(self):
+        """Population standard deviation, same as np.std"""
+        return np.sqrt(self.var)
+
+    @property
+    def sem(self):
+        """Standard error of the mean"""
+        return np.sqrt(self._m2 / max(self.count-1, 1) / self.count)
+
+
+class Histogram:
+    def __init__(self, low, high, bins=100, pooled=False):
+        """Elementwise histogram with fixed bins
+        Args:
+            low: lower edge of the first bin
+            high: upper edge of the last bin
+            bins: number of bins
+            pooled: bool, True for a single histogram of all values added; each realization
+                is flattened and nan and inf are skipped
+        Values outside [low, high) are counted in underflow and overflow; nan is ignored
+        """
+        self.edges = np.linspace(low, high, bins+1)
+        self.pooled = pooled
+        self.count = 0
+        self.counts = None
+        self.underflow = None
+        self.overflow = None
+
+    def add(self, x):
+        """Adds one realization; x is a float or array with the same shape every call
+        unless pooled"""
+        x = np.asarray(x, dtype=float)
+        nbins = len(self.edges) - 1
+        if self.pooled:
+            x = x[np.isfinite(x)]
+            if self.counts is None:
+                self.counts = np.zeros(nbins, dtype=np.int64)
+                self.underflow = np.int64(0)
+                self.overflow = np.int64(0)
+            self.count += 1
+            self.underflow += np.sum(x < self.edges[0])
+            self.overflow += np.sum(x >= self.edges[-1])
+            inside = (x >= self.edges[0]) & (x < self.edges[-1])
+            b = np.clip(np.searchsorted(self.edges, x[inside], side='right') - 1, 0, nbins-1)
+            self.counts += np.bincount(b, minlength=nbins)
+            return
+        if self.counts is None:
+            self.counts = np.zeros(x.shape + (nbins,), dtype=np.int64)
+            self.underflow = np.zeros(x.shape, dtype=np.int64)
+            self.overflow = np.zeros(x.shape, dtype=np.int64)
+        self.count += 1
+        self.underflow += x < self.edges[0]
+        self.overflow += x >= self.edges[-1]
+        inside = (x >= self.edges[0]) & (x < self.edges[-1])
+        b = np.clip(np.searchsorted(self.edges, x, side='right') - 1, 0, nbins-1)
+        np.add.at(self.counts.reshape(-1, nbins), (np.flatnonzero(inside), b.ravel()[inside.ravel()]), 1)
+
+    def density(self):
+        """Returns the normalized histogram of the values inside the bins"""
+        width = np.diff(self.edges)
+        total = np.sum(self.counts, axis=-1, keepdims=True)
+        return self.counts / np.maximum(total, 1) / width
+
+    def quantile(self, q):
+        """Approximate quantile from the binned data; accurate to one bin width
+        Args:
+            q: quantile between 0 and 1
+        Returns:
+            array of quantiles with the shape of the added values; 0-d if pooled
+        """
+        underflow = np.asarray(self.underflow)[..., None]
+        cdf = np.concatenate((underflow, np.cumsum(self.counts, axis=-1) + underflow), axis=-1)
+        cdf = cdf / np.maximum(cdf[..., -1:] + np.asarray(self.overflow)[..., None], 1) #nan is not counted
+        flat = cdf.reshape(-1, cdf.shape[-1])
+        return np.array([np.interp(q, row, self.edges) for row in flat]).reshape(cdf.shape[:-1])
+
+
+class Quantile:
+    def __init__(self, q, pooled=False):
+        """Elementwise running estimate of the q quantile using the P^2 algorithm
+        (Jain and Chlamtac 1985) which keeps five markers per element
+        Args:
+            q: quantile between 0 and 1
+            pooled: bool, True for the quantile of all values added; each realization is
+                flattened, nan and inf are skipped and the values are added one by one
+        """
+        self.q = q
+        self.pooled = pooled
+        self.count = 0
+        self._first = []
+        self._heights = None
+        self._pos = None
+        self._desired = np.array([1, 1+2*q, 1+4*q, 3+2*q, 5], dtype=float)
+        self._increments = np.array([0, q/2, q, (1+q)/2, 1], dtype=float)
+
+    def add(self, x):
+        """Adds one realization; x is a float or array with the same shape every call
+        unless pooled"""
+        x = np.asarray(x, dtype=float)
+        if self.pooled:
+            for val in x[np.isfinite(x)].tolist():
+                self._add_value(val)
+            return
+        self.count += 1
+        if self._heights is None:
+            self._first.append(x)
+            if len(self._first) == 5:
+                self._heights = np.sort(np.array(self._first), axis=0)
+                self._pos = np.broadcast_to(np.arange(1, 6, dtype=float).reshape((5,) + (1,)*x.ndim), self._heights.shape).copy()
+                self._desired = np.broadcast_to(self._desired.reshape((5,) + (1,)*x.ndim), self._heights.shape).copy()
+                self._first = []
+            return
+
+        q, n = self._heights, self._pos
+        #find the cell containing x and adjust the extreme markers
+        q[0] = np.minimum(q[0], x)
+        q[4] = np.maximum(q[4], x)
+        k = np.sum(x >= q[1:4], axis=0)
+        for i in range(1, 5):
+            n[i] += k < i
+        self._desired += self._increments.reshape((5,) + (1,)*x.ndim)
+
+        #adjust the middle markers
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            move = ((d >= 1) & (n[i+1] - n[i] > 1)) | ((d <= -1) & (n[i-1] - n[i] < -1))
+            d = np.sign(d) * move
+            if not np.any(move):
+                continue
+            with np.errstate(divide='ignore', invalid='ignore'):
+                parabolic = q[i] + d / (n[i+1] - n[i-1]) * ((n[i] - n[i-1] + d) * (q[i+1] - q[i]) / (n[i+1] - n[i])
+                                                            + (n[i+1] - n[i] - d) * (q[i] - q[i-1]) / (n[i] - n[i-1]))
+                linear = np.where(d > 0, q[i] + (q[i+1] - q[i]) / (n[i+1] - n[i]),
+                                  q[i] - (q[i-1] - q[i]) / (n[i-1] - n[i]))
+            ok = (q[i-1] < parabolic) & (parabolic < q[i+1])
+            q[i] = np.where(move, np.where(ok, parabolic, linear), q[i])
+            n[i] += d
+
+    def _add_value(self, x):
+        """Updates the markers of a pooled quantile with one float; same steps as add on
+        python floats, which is much faster than on 0-d arrays"""
+        self.count += 1
+        if self._heights is None:
+            self._first.append(x)
+            if len(self._first) == 5:
+                self._heights = sorted(self._first)
+                self._pos = [1., 2., 3., 4., 5.]
+                self._desired = self._desired.tolist()
+                self._first = []
+            return
+
+        q, n, desired = self._heights, self._pos, self._desired
+        q[0] = min(q[0], x)
+        q[4] = max(q[4], x)
+        k = (x >= q[1]) + (x >= q[2]) + (x >= q[3])
+        for i in range(k+1, 5):
+            n[i] += 1
+        for i, increment in enumerate(self._increments.tolist()):
+            desired[i] += increment
+
+        for i in range(1, 4):
+            d = desired[i] - n[i]
+            if not ((d >= 1 and n[i+1] - n[i] > 1) or (d <= -1 and n[i-1] - n[i] < -1)):
+                continue
+            d = 1 if d > 0 else -1
+            parabolic = q[i] + d / (n[i+1] - n[i-1]) * ((n[i] - n[i-1] + d) * (q[i+1] - q[i]) / (n[i+1] - n[i])
+                                                        + (n[i+1] - n[i] - d) * (q[i] - q[i-1]) / (n[i] - n[i-1]))
+            if q[i-1] < parabolic < q[i+1]:
+                q[i] = parabolic
+            else: #linear
+                q[i] += d * (q[i+d] - q[i]) / (n[i+d] - n[i])
+            n[i] += d
+
+    @property
+    def value(self):
+        """Returns the current quantile estimate"""
+        if self._heights is None:
+            return np.quantile(np.array(self._first), self.q, axis=0)
+        return np.copy(self._heights[2])
+
+
+class Ensemble:
+    def __init__(self, path, accumulators, checkpoint_every=100, seed=None):
+        """Runs realizations into accumulators with periodic checkpoints
+        If a checkpoint exists at path, the accumulators, number of completed
+        realizations and numpy random state are restored from it and the given
+        accumulators are ignored.
+        Args:
+            path: checkpoint file
+            accumulators: dict of name: accumulator or list of accumulators for each
+                output of the realization
+            checkpoint_every: number of realizations between checkpoints
+            seed: seed for np.random when starting a new ensemble
+        """
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            self.accumulators = state['accumulators']
+            self.count = state['count']
+            np.random.set_state(state['random_state'])
+        else:
+            self.accumulators = accumulators
+            self.count = 0
+            if seed is not None:
+                np.random.seed(seed)
+
+    def __getitem__(self, name): return self.accumulators[name]
+
+    def run(self, realization, nruns):
+        """Runs realizations until nruns have been completed
+        Args:
+            realization: function with no arguments returning a dict of name: value;
+                random draws must use np.random (e.g. the rand module) to be resumable
+            nruns: total number of realizations
+        Returns:
+            dict of accumulators
+        """
+        while self.count < nruns:
+            for name, value in realization().items():
+                accumulators = self.accumulators[name]
+                if not isinstance(accumulators, (list, tuple)):
+                    accumulators = [accumulators]
+                for accumulator in accumulators:
+                    accumulator.add(value)
+            self.count += 1
+            if self.count % self.checkpoint_every == 0:
+                self.checkpoint()
+        self.checkpoint()
+        return self.accumulators
+
+    def checkpoint(self):
+        """Atomically writes the ensemble state to path"""
+        state = {'accumulators': self.accumulators,
+                 'count': self.count,
+                 'random_state': np.random.get_state()}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,291 @@
+"""Batch sweeps and disorder ensembles of cavity arrays from a JSON spec
+
+    python batch.py spec.json [--output PATH] [--format parquet|hdf5|zarr] [--processes N]
+
+The spec is a dict containing
+    'geometry': num_cavities, num_photons and optional multi_cavity.CavityArray keyword
+        args (periodic, edges, reorder, precision, storage, ...); edges can also be
+        {"square_lattice": [nx, ny, periodic]}
+    'model_params': model params shared by every run, see multi_cavity.CavityArray
+    'grid': optional dict of model params key: list of values; the runs cover the
+        cartesian product of the grids. A 'key.arg' entry sweeps argument arg of the
+        rand distribution of key
+    'rand': optional dict of model params key: keyword args of the rand function of
+        the same name; drawn for every run
+    'realizations': number of runs for each grid point, default 1
+    'metrics': list of METRICS computed for every run
+    'seed': optional seed; run i draws from numpy.random.SeedSequence(seed, spawn_key=(i,))
+    'chunksize': number of runs computed between writes, default 100
+    'output': optional dict with the 'path' and 'format' of the results
+
+Results have one row per eigenstate of every run with the columns 'run',
+'realization', 'level', one column per grid key and one per metric; complex metrics
+are split into '_real' and '_imag' columns and per cavity metrics into '_<cavity>'
+columns. Every chunk is appended to the output as soon as it is computed; rerunning
+an interrupted spec skips the runs already written.
+"""
+
+import numpy as np
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import multi_cavity
+import metrics
+import rand
+import topology
+
+METRICS = {'energy': lambda cavity_array: cavity_array.eigenstates()[0],
+           'participation': metrics.participation,
+           'node_participation': metrics.node_participation,
+           'polariton_participation': metrics.polariton_participation,
+           'photon_expect': metrics.photon_expect,
+           'excite_expect': metrics.excite_expect,
+           'level_spacing': metrics.level_spacing,
+           'level_ratio': lambda cavity_array: metrics.level_spacing(cavity_array, ratio=True),
+           'discarded_weight': lambda cavity_array: cavity_array.discarded_weight}
+
+#rand functions drawing per emitter values
+EMITTER_KEYS = ['emitter_freqs', 'g']
+
+
+def run(spec, path=None, fmt=None, processes=1):
+    """Runs every task of spec and writes the results
+    Args:
+        spec: spec dict or path of a JSON spec file
+        path: output path; default is spec['output']['path']
+        fmt: 'parquet', 'hdf5' or 'zarr'; default is spec['output']['format'] or
+            inferred from the path extension
+        processes: number of worker processes; 1 runs in this process, None uses every cpu
+    Returns:
+        the output path
+    """
+    if isinstance(spec, str):
+        with open(spec) as f:
+            spec = json.load(f)
+    output = spec.get('output', {})
+    path = path or output['path']
+    fmt = fmt or output.get('format') or output_format(path)
+    for name in spec['metrics']:
+        assert name in METRICS, "metric should be one of {}, got '{}'".format(list(METRICS), name)
+
+    chunksize = spec.get('chunksize', 100)
+    writer = WRITERS[fmt](path, spec)
+    done = writer.open()
+    remaining = itertools.islice(tasks(spec), done, None)
+    pool = None if processes == 1 else ProcessPoolExecutor(max_workers=processes)
+    try:
+        while True:
+            chunk = list(itertools.islice(remaining, chunksize))
+            if not chunk:
+                break
+            if pool is None:
+                results = [run_task(spec, task) for task in chunk]
+            else:
+                results = list(pool.map(run_task, [spec] * len(chunk), chunk))
+            writer.append({name: np.concatenate([result[name] for result in results]) for name in results[0]}, len(chunk))
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown()
+    return path
+
+def tasks(spec):
+    """Returns an iterator over the (run, grid point, realization) tasks of spec in run
+    order; the tasks are generated as they are needed"""
+    grid = spec.get('grid', {})
+    realizations = range(spec.get('realizations', 1))
+    runs = ((dict(zip(grid, values)), r) for values in itertools.product(*grid.values()) for r in realizations)
+    return ((i, point, r) for i, (point, r) in enumerate(runs))
+
+def cavity_array(spec, point, seed):
+    """Builds the CavityArray of a run
+    Args:
+        spec: spec dict
+        point: dict of grid key: value of the run
+        seed: numpy.random.SeedSequence of the run
+    """
+    geometry = dict(spec['geometry'])
+    num_cavities, num_photons = geometry.pop('num_cavities'), geometry.pop('num_photons')
+    if isinstance(geometry.get('edges'), dict):
+        geometry['edges'] = topology.square_lattice(*geometry['edges']['square_lattice'])
+
+    model_params = dict(spec.get('model_params', {}))
+    distributions = {key: dict(kwargs) for key, kwargs in spec.get('rand', {}).items()}
+    for key, val in point.items():
+        if '.' in key:
+            key, arg = key.split('.')
+            distributions[key][arg] = val
+        else:
+            model_params[key] = val
+
+    np.random.seed(seed.generate_state(1))
+    #draw emitters_per_cavity first for the per emitter distributions
+    for key in sorted(distributions, key=lambda key: key in EMITTER_KEYS):
+        kwargs = distributions[key]
+        if key in EMITTER_KEYS:
+            kwargs.setdefault('emitters_per_cavity', model_params['emitters_per_cavity'])
+        model_params[key] = getattr(rand, key)(num_cavities, **kwargs)
+    return multi_cavity.CavityArray(num_cavities, num_photons, model_params, **geometry)
+
+def run_task(spec, task):
+    """Computes the metrics of one run
+    Returns:
+        dict of column name: array with one entry per eigenstate
+    """
+    i, point, realization = task
+    seed = np.random.SeedSequence(spec.get('seed'), spawn_key=(i,))
+    array = cavity_array(spec, point, seed)
+    num_levels = len(array.states)
+    result = {'run': np.full(num_levels, i),
+              'realization': np.full(num_levels, realization),
+              'level': np.arange(num_levels)}
+    for key, val in point.items():
+        result[key.replace('.', '_')] = np.full(num_levels, val)
+    for name in spec['metrics']:
+        result.update(columns(name, METRICS[name](array), num_levels))
+    return result
+
+def columns(name, values, num_levels):
+    """Splits a metric into float columns of length num_levels; shorter metrics,
+    e.g. level spacings, are padded with nan"""
+    values = np.asarray(values)
+    if np.iscomplexobj(values):
+        return dict(**columns(name + '_real', values.real, num_levels), **columns(name + '_imag', values.imag, num_levels))
+    if values.ndim == 2:
+        return {'{}_{}'.format(name, i): columns(name, values[:, i], num_levels)[name] for i in range(values.shape[1])}
+    padded = np.full(num_levels, np.nan)
+    padded[:len(values)] = values
+    return {name: padded}
+
+def output_format(path):
+    """Infers the output format from the path extension"""
+    ext = os.path.splitext(path.rstrip('/'))[1]
+    formats = {'.parquet': 'parquet', '.h5': 'hdf5', '.hdf5': 'hdf5', '.zarr': 'zarr'}
+    assert ext in formats, "Cannot infer the output format of '{}'; use one of {}".format(path, list(formats))
+    return formats[ext]
+
+
+#writers; each appends chunks of columns and returns the number of runs already written on open
+
+class ParquetWriter:
+    def __init__(self, path, spec):
+        """Writes each chunk as a part file of a parquet dataset directory"""
+        import pyarrow
+        import pyarrow.parquet
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.path = path
+        self.spec = spec
+
+    def open(self):
+        os.makedirs(self.path, exist_ok=True)
+        _check_spec(os.path.join(self.path, '_spec.json'), self.spec) #files starting with _ are skipped by parquet readers
+        self.parts = sorted(f for f in os.listdir(self.path) if f.startswith('part-') and f.endswith('.parquet'))
+        runs = [self.pq.read_table(os.path.join(self.path, f), columns=['run']).column('run').to_numpy() for f in self.parts]
+        return len(np.unique(np.concatenate(runs))) if runs else 0
+
+    def append(self, columns, runs):
+        name = 'part-{:06d}.parquet'.format(len(self.parts))
+        tmp = os.path.join(self.path, '_' + name)
+        self.pq.write_table(self.pa.table(columns), tmp)
+        os.replace(tmp, os.path.join(self.path, name))
+        self.parts.append(name)
+
+    def close(self): pass
+
+
+class HDF5Writer:
+    def __init__(self, path, spec):
+        """Appends each chunk to resizable 1d datasets of an HDF5 file"""
+        import h5py
+        self.h5py = h5py
+        self.path = path
+        self.spec = spec
+
+    def open(self):
+        self.file = self.h5py.File(self.path, 'a')
+        return _open_group(self.file, self.spec, lambda dataset, rows: dataset.resize((rows,)))
+
+    def append(self, columns, runs):
+        rows = self.file.attrs['rows']
+        for name, values in columns.items():
+            if name not in self.file:
+                self.file.create_dataset(name, shape=(0,), maxshape=(None,), dtype=values.dtype, chunks=True)
+            dataset = self.file[name]
+            dataset.resize((rows + len(values),))
+            dataset[rows:] = values
+        _commit(self.file, runs, len(columns['run']))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ZarrWriter:
+    def __init__(self, path, spec):
+        """Appends each chunk to 1d arrays of a zarr group"""
+        import zarr
+        self.zarr = zarr
+        self.path = path
+        self.spec = spec
+
+    def open(self):
+        self.group = self.zarr.open_group(self.path, mode='a')
+        return _open_group(self.group, self.spec, lambda array, rows: array.resize(rows))
+
+    def append(self, columns, runs):
+        rows = self.group.attrs['rows']
+        for name, values in columns.items():
+            if name not in self.group:
+                self.group.zeros(name, shape=(rows,), chunks=(max(len(values), 1024),), dtype=values.dtype)
+            self.group[name].append(values)
+        _commit(self.group, runs, len(columns['run']))
+
+    def close(self): pass
+
+
+WRITERS = {'parquet': ParquetWriter, 'hdf5': HDF5Writer, 'zarr': ZarrWriter}
+
+def _check_spec(filename, spec):
+    """Saves spec to filename or checks it matches the spec of previous runs"""
+    if os.path.exists(filename):
+        with open(filename) as f:
+            assert json.load(f) == json.loads(json.dumps(spec)), "'{}' was written with a different spec".format(filename)
+    else:
+        with open(filename, 'w') as f:
+            json.dump(spec, f)
+
+def _open_group(group, spec, resize):
+    """Checks the spec of an HDF5 file or zarr group and drops rows of an interrupted append
+    Returns:
+        the number of runs written
+    """
+    if 'spec' in group.attrs:
+        assert json.loads(group.attrs['spec']) == json.loads(json.dumps(spec)), "Output was written with a different spec"
+    else:
+        group.attrs['spec'] = json.dumps(spec)
+        group.attrs['rows'] = 0
+        group.attrs['runs'] = 0
+    for name in group:
+        resize(group[name], group.attrs['rows'])
+    return group.attrs['runs']
+
+def _commit(group, runs, rows):
+    """Records an appended chunk once every column is written"""
+    group.attrs['rows'] = int(group.attrs['rows'] + rows)
+    group.attrs['runs'] = int(group.attrs['runs'] + runs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('spec', help='JSON spec file')
+    parser.add_argument('--output', help='output path; default is the spec output path')
+    parser.add_argument('--format', choices=list(WRITERS), help='output format; default is inferred from the path')
+    parser.add_argument('--processes', type=int, default=1, help='number of worker processes; 0 uses every cpu')
+    args = parser.parse_args(argv)
+    print(run(args.spec, args.output, args.format, args.processes or None))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Compressed storage of the cached eigenvectors of a cavity array
+
+The metrics only depend on the probabilities |v_i|^2 of the eigenvector
+components, and the eigenvectors of strongly disordered arrays are localized on
+a few basis states, so the dense N x N complex eigenvector matrix can be stored as
+    'dense': the complex eigenvectors
+    'prob': |v_i|^2 only, in float32
+    'sparse': the largest components of each eigenvector; the smallest components
+        are dropped while their total weight sum |v_i|^2 stays below tol
+    'topk': the k largest components of each eigenvector
+Sparse storages are scipy.sparse.csc_matrix with one column per eigenvector. The
+dropped components are not renormalized; the weight discarded from each
+eigenvector is returned with the compressed eigenvectors.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+STORAGES = ['dense', 'prob', 'sparse', 'topk']
+
+
+def compress(eig_vecs, storage='dense', tol=1e-6, k=8):
+    """
+    Args:
+        eig_vecs: dense eigenvectors (columns)
+        storage: one of STORAGES
+        tol: max discarded weight of each normalized eigenvector for 'sparse'
+        k: number of components kept per eigenvector for 'topk'
+    Returns:
+        (compressed eigenvectors, discarded weight of each eigenvector)
+    """
+    assert storage in STORAGES, "storage should be one of {}, got '{}'".format(STORAGES, storage)
+    P = np.abs(eig_vecs)**2
+    if storage == 'dense':
+        return eig_vecs, np.zeros(eig_vecs.shape[-1])
+    if storage == 'prob':
+        return P.astype(np.float32), np.zeros(eig_vecs.shape[-1])
+
+    order = np.argsort(P, axis=0) #ascending within each column
+    if storage == 'sparse':
+        cumulative = np.cumsum(np.take_along_axis(P, order, axis=0), axis=0)
+        drop = cumulative <= tol * cumulative[-1]
+    else:
+        drop = np.arange(P.shape[0])[:, None] < P.shape[0] - k
+    keep = np.ones(P.shape, dtype=bool)
+    np.put_along_axis(keep, order, ~drop, axis=0)
+
+    discarded = np.sum(np.where(keep, 0, P), axis=0)
+    cols, rows = np.nonzero(keep.T) #column major order for csc
+    vecs = sp.csc_matrix((eig_vecs[rows, cols], (rows, cols)), shape=eig_vecs.shape)
+    return vecs, discarded
+
+def probabilities(eig_vecs, storage='dense'):
+    """Returns |v_i|^2 of compressed eigenvectors; a sparse matrix for sparse storages"""
+    if storage == 'prob':
+        return eig_vecs
+    if sp.issparse(eig_vecs):
+        return abs(eig_vecs).power(2).tocsc()
+    return np.abs(eig_vecs)**2
+
+def todense(eig_vecs):
+    """Returns compressed eigenvectors as a dense array; dropped components are 0"""
+    if sp.issparse(eig_vecs):
+        return eig_vecs.toarray()
+    return eig_vecs
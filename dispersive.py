@@ -0,0 +1,172 @@
+"""Effective photonic model of a single photon cavity array in the dispersive regime
+
+When the emitters are far detuned from their cavity, the emitters can be
+eliminated perturbatively leaving a num_cavities x num_cavities hopping matrix
+with emitter induced frequency shifts and losses on the diagonal.
+
+The second order Schrieffer-Wolff hamiltonian is
+    H_ii = w_i - 0.5j*kappa_i + sum_j g_ij^2 / (w_i - 0.5j*kappa_i - w_ij + 0.5j*gamma_ij)
+with the hopping terms of the full model off the diagonal. Higher orders are
+obtained by evaluating the emitter self energy at the eigenvalue instead of the
+bare cavity frequency, i.e. solving the nonlinear eigenproblem
+    (H_eff(E) - E) c = 0
+Each eigenpair of the second order hamiltonian is refined separately by Newton
+steps on the Rayleigh functional c^T (H_eff(E) - E) c of the complex symmetric
+H_eff; a step costs one sparse solve over the hopping graph and at least doubles
+the order in g. Iterated to convergence this gives the photon-like eigenvalues
+of the full model exactly.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg
+
+from util import sort_eigenstates
+
+
+def photon_hamiltonian(cavity_array):
+    """
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+    Returns:
+        num_cavities x num_cavities hamiltonian of the bare cavities including hopping and kappa
+    """
+    H = np.diag([cavity.cavity_freq - 0.5j * cavity.kappa for cavity in cavity_array]).astype('complex')
+    for (i, j), J in zip(cavity_array.edges, cavity_array.hopping):
+        H[i][j] -= J
+        H[j][i] -= J
+    return H
+
+def self_energy(cavity_array, energy):
+    """Emitter self energy sum_j g_ij^2 / (E - w_ij + 0.5j*gamma_ij) of each cavity
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+        energy: float or list of energies for each cavity
+    Returns:
+        array of the self energy of each cavity
+    """
+    energy = np.broadcast_to(energy, (cavity_array.num_cavities,))
+    return np.array([np.sum(np.array(cavity.g)**2 / (E - np.array(cavity.emitter_freqs) + 0.5j * np.array(cavity.gamma)))
+                     for E, cavity in zip(energy, cavity_array)])
+
+def effective_hamiltonian(cavity_array, energy=None):
+    """
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+        energy: energy the self energy is evaluated at; None for the bare cavity
+            frequencies, i.e. the second order Schrieffer-Wolff hamiltonian
+    Returns:
+        num_cavities x num_cavities effective photonic hamiltonian
+    """
+    H = photon_hamiltonian(cavity_array)
+    if energy is None:
+        energy = np.diag(H)
+    return H + np.diag(self_energy(cavity_array, energy))
+
+def eigenstates(cavity_array, order=2, tol=1e-12, max_iter=100):
+    """Photon-like eigenstates of the effective model
+    Args:
+        cavity_array: multi_cavity.CavityArray object with one photon
+        order: even perturbative order in g; 2 for Schrieffer-Wolff, each further even order
+            adds a Newton refinement of every eigenpair, None iterates until converged
+        tol: convergence tolerance on the eigenvalues for order=None
+        max_iter: max refinements for order=None
+    Returns:
+        eigenvalues and photonic eigenvectors (columns) sorted by energy level
+    """
+    assert cavity_array.num_photons == 1, "the dispersive model is for single photon arrays, got {} photons".format(cavity_array.num_photons)
+    assert order is None or (order >= 2 and order % 2 == 0), "order should be an even integer >= 2 or None, got {}".format(order)
+    eig_vals, eig_vecs = np.linalg.eig(effective_hamiltonian(cavity_array))
+    iterations = max_iter if order is None else (order - 2) // 2
+    if iterations == 0:
+        return sort_eigenstates(eig_vals, eig_vecs)
+    
+    H = sp.csc_matrix(photon_hamiltonian(cavity_array))
+    emitters = _emitter_arrays(cavity_array)
+    for k in range(len(eig_vals)):
+        E, c = eig_vals[k], eig_vecs[:, k]
+        for _ in range(iterations):
+            #Newton step on the Rayleigh functional c^T T(E) c with T(E) = H_eff(E) - E
+            sigma, dsigma = _self_energy(emitters, E)
+            T = H + sp.diags(sigma - E, format='csc')
+            step = (c @ (T @ c)) / (c @ ((dsigma - 1) * c))
+            E = E - step
+            if np.abs(step) < tol:
+                break
+            #inverse iteration with T(E)^-1 T'(E) for the eigenvector, unless T(E) c = 0 already
+            sigma, dsigma = _self_energy(emitters, E)
+            T = H + sp.diags(sigma - E, format='csc')
+            if np.linalg.norm(T @ c) < tol:
+                break
+            c = scipy.sparse.linalg.spsolve(T, (dsigma - 1) * c)
+            c = c / np.linalg.norm(c)
+        eig_vals[k], eig_vecs[:, k] = E, c
+    return sort_eigenstates(eig_vals, eig_vecs)
+
+def _emitter_arrays(cavity_array):
+    """Flat g^2 and complex frequency of every emitter with the sparse matrix summing
+    them by cavity"""
+    cavity = np.repeat(np.arange(cavity_array.num_cavities), [c.num_emitters for c in cavity_array])
+    g2 = np.concatenate([np.array(c.g, dtype=float)**2 for c in cavity_array] + [[]])
+    we = np.concatenate([np.array(c.emitter_freqs, dtype=float) - 0.5j * np.array(c.gamma, dtype=float) for c in cavity_array] + [[]])
+    S = sp.csr_matrix((np.ones(len(cavity)), (cavity, np.arange(len(cavity)))), shape=(cavity_array.num_cavities, len(cavity)))
+    return S, g2, we
+
+def _self_energy(emitters, energy):
+    """Self energy of each cavity and its derivative at a single energy
+    Args:
+        emitters: flat emitter arrays from _emitter_arrays
+        energy: complex energy
+    """
+    S, g2, we = emitters
+    x = 1 / (energy - we)
+    return S @ (g2 * x), -(S @ (g2 * x**2))
+
+def lift(cavity_array, eig_vals, eig_vecs):
+    """Reconstructs full model eigenvectors from the effective model
+    Args:
+        cavity_array: multi_cavity.CavityArray object with one photon
+        eig_vals: eigenvalues of the effective model
+        eig_vecs: photonic eigenvectors (columns) of the effective model
+    Returns:
+        normalized eigenvectors in the cavity_array.states basis with the emitter
+        amplitudes g_ij c_i / (E - w_ij + 0.5j*gamma_ij)
+    """
+    assert cavity_array.num_photons == 1, "the dispersive model is for single photon arrays, got {} photons".format(cavity_array.num_photons)
+    vecs = np.zeros((len(cavity_array.states), len(eig_vals)), dtype='complex')
+    for i, cavity in enumerate(cavity_array):
+        vecs[cavity_array.states.index([(i, -1)])] = eig_vecs[i]
+        for j in range(cavity.num_emitters):
+            we = cavity.emitter_freqs[j] - 0.5j * cavity.gamma[j]
+            vecs[cavity_array.states.index([(i, j)])] = cavity.g[j] * eig_vecs[i] / (eig_vals - we)
+    return vecs / np.linalg.norm(vecs, axis=0)
+
+def residuals(cavity_array, eig_vals, eig_vecs):
+    """Error estimate of the effective model against the full model
+    The lifted eigenvector solves the emitter rows of the full hamiltonian exactly, so
+    the full residual |Hv - Ev|/|v| reduces to |(H_eff(E) - E)c|/|v| and costs no more
+    than the effective model. For lossless arrays it bounds the eigenvalue error.
+    Args:
+        cavity_array: multi_cavity.CavityArray object with one photon
+        eig_vals: eigenvalues of the effective model
+        eig_vecs: photonic eigenvectors (columns) of the effective model
+    Returns:
+        residual of each eigenpair in the full model
+    """
+    assert cavity_array.num_photons == 1, "the dispersive model is for single photon arrays, got {} photons".format(cavity_array.num_photons)
+    r = np.zeros(len(eig_vals))
+    for k, (E, c) in enumerate(zip(eig_vals, eig_vecs.T)):
+        norm2 = np.sum(np.abs(c)**2)
+        for i, cavity in enumerate(cavity_array):
+            we = np.array(cavity.emitter_freqs) - 0.5j * np.array(cavity.gamma)
+            norm2 += np.sum(np.abs(np.array(cavity.g) * c[i] / (E - we))**2)
+        r[k] = np.linalg.norm((effective_hamiltonian(cavity_array, E) - E * np.eye(len(c))) @ c) / np.sqrt(norm2)
+    return r
+
+def dispersive_parameter(cavity_array):
+    """Returns max |g_ij / (w_i - w_ij)| with complex frequencies; the effective model
+    is accurate when this is small"""
+    ratios = [np.abs(np.array(cavity.g) / (cavity.cavity_freq - 0.5j * cavity.kappa
+                                         - np.array(cavity.emitter_freqs) + 0.5j * np.array(cavity.gamma)))
+              for cavity in cavity_array if cavity.num_emitters]
+    return max([np.max(r) for r in ratios], default=0)
@@ -0,0 +1,103 @@
+"""Eigensolvers exploiting the structure of the cavity array hamiltonian
+
+The structure is known from the model params: without loss the hamiltonian is
+hermitian, and with equal loss on every cavity and emitter it is a hermitian
+matrix shifted by a constant imaginary part, so both can be diagonalized with
+hermitian solvers. Sparse hamiltonians with a small bandwidth, possibly after a
+reverse Cuthill-McKee reordering, use the LAPACK banded solvers.
+"""
+
+import numpy as np
+import scipy.linalg
+import scipy.sparse as sp
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+#use banded solvers when (bandwidth + 1) * BANDED_RATIO <= dimension
+BANDED_RATIO = 8
+
+
+def uniform_loss(model_params):
+    """Returns the common kappa and gamma if every cavity and emitter has the same loss
+    rate, e.g. 0 for a hermitian hamiltonian; None otherwise"""
+    losses = set(model_params['kappa'])
+    losses.update(val for vals in model_params['gamma'] for val in vals)
+    if len(losses) == 1:
+        return losses.pop()
+    if len(losses) == 0:
+        return 0
+    return None
+
+def classify(model_params):
+    """Returns 'hermitian' for lossless arrays, 'shifted' if every cavity and emitter has
+    the same nonzero loss and 'general' otherwise"""
+    loss = uniform_loss(model_params)
+    if loss is None:
+        return 'general'
+    return 'hermitian' if loss == 0 else 'shifted'
+
+def bandwidth(H):
+    """Returns the max |row - col| of the nonzero entries of sparse matrix H"""
+    H = sp.coo_matrix(H)
+    if H.nnz == 0:
+        return 0
+    return int(np.max(np.abs(H.row - H.col)))
+
+def banded_order(H):
+    """Returns the permutation of the basis with the smaller bandwidth out of the
+    natural and reverse Cuthill-McKee orderings, and that bandwidth"""
+    H = sp.csr_matrix(H)
+    natural = np.arange(H.shape[0])
+    u = bandwidth(H)
+    pattern = sp.csr_matrix((np.ones(H.nnz), H.indices, H.indptr), shape=H.shape)
+    rcm = reverse_cuthill_mckee(pattern + pattern.T, symmetric_mode=True).astype(int)
+    u_rcm = bandwidth(H[rcm][:, rcm])
+    if u_rcm < u:
+        return rcm, u_rcm
+    return natural, u
+
+def use_banded(H, u):
+    """Returns True if the bandwidth u of H is small enough for the banded solvers"""
+    return (u + 1) * BANDED_RATIO <= H.shape[0]
+
+def to_banded(H, u):
+    """Returns the lower banded storage ab[i-j, j] = H[i, j] of sparse matrix H with bandwidth u"""
+    H = sp.coo_matrix(H)
+    lower = H.row >= H.col
+    ab = np.zeros((u + 1, H.shape[0]), dtype=H.dtype)
+    ab[H.row[lower] - H.col[lower], H.col[lower]] = H.data[lower]
+    return ab
+
+def eigh_banded(H, window=None, dtype='complex', order=None):
+    """Eigenstates of a sparse hermitian matrix using scipy.linalg.eig_banded
+    Args:
+        H: sparse hermitian matrix
+        window: optional (emin, emax); only eigenvalues in (emin, emax] are computed
+        dtype: complex dtype the solve is done in
+        order: optional (permutation, bandwidth) from banded_order
+    Returns:
+        eigenvalues and eigenvectors (columns) in the original basis sorted by energy
+    """
+    H = sp.csr_matrix(H)
+    order, u = banded_order(H) if order is None else order
+    ab = to_banded(H[order][:, order], u).astype(dtype)
+    if window is None:
+        eig_vals, eig_vecs = scipy.linalg.eig_banded(ab, lower=True)
+    else:
+        eig_vals, eig_vecs = scipy.linalg.eig_banded(ab, lower=True, select='v', select_range=window)
+    vecs = np.empty_like(eig_vecs)
+    vecs[order] = eig_vecs
+    return eig_vals, vecs
+
+def eigh_shifted(H, loss=0, dtype='complex'):
+    """Eigenstates of H = A - 0.5j*loss with A hermitian using scipy.linalg.eigh
+    Args:
+        H: dense or sparse matrix
+        loss: uniform loss rate; 0 for hermitian H
+        dtype: complex dtype the solve is done in
+    Returns:
+        eigenvalues and eigenvectors (columns) sorted by energy
+    """
+    A = H.toarray() if sp.issparse(H) else np.array(H)
+    A = (A + 0.5j * loss * np.eye(A.shape[0], dtype=A.dtype)).astype(dtype)
+    eig_vals, eig_vecs = scipy.linalg.eigh(A)
+    return eig_vals - 0.5j * loss, eig_vecs
@@ -0,0 +1,135 @@
+"""Fitting model params of a cavity array to target energy levels
+
+fit() adjusts selected model params so that energy levels of the array match
+target values, minimizing the weighted squared error with scipy.optimize.minimize.
+The basis and the structure matrices of sensitivity are built once; each step
+assembles H = sum_p theta_p M_p, diagonalizes it and takes the gradient from the
+analytic eigenvalue jacobian. Multi-start runs from randomly perturbed initial
+params run in parallel worker processes.
+"""
+
+import numpy as np
+import scipy.optimize
+import copy
+from concurrent.futures import ProcessPoolExecutor
+
+import multi_cavity
+import sensitivity
+
+#fit problem shared by all starts run in a process
+_problem = None
+
+#model params fitted by default
+FIT_KEYS = ['cavity_freqs', 'emitter_freqs', 'g', 'hopping']
+
+
+def fit(cavity_array, targets, levels=None, params=None, weights=None, bounds=None, nstarts=1, spread=0.1,
+        processes=None, seed=None, method='L-BFGS-B', **kwargs):
+    """
+    Args:
+        cavity_array: multi_cavity.CavityArray object with the initial model params
+        targets: target energies; real targets are matched by the real part of the
+            eigenvalues and complex targets by the complex eigenvalues
+        levels: indices of the energy levels, sorted by real part, matched to the targets;
+            default is the lowest len(targets) levels
+        params: model params to fit as keys, e.g. 'g', or (key, idx) labels, see
+            sensitivity; default is every param of FIT_KEYS
+        weights: optional weight of each target
+        bounds: optional dict of key or label: (low, high); labels take precedence over keys
+        nstarts: number of starts; the first starts from the model params of cavity_array
+            and the others from the model params plus normal noise
+        spread: standard deviation of the noise added to the initial params
+        processes: number of worker processes for the starts; 1 runs in this process,
+            None uses every cpu
+        seed: seed for numpy.random.SeedSequence of the starts
+        method, kwargs: passed to scipy.optimize.minimize
+    Returns:
+        dict containing
+            'cavity_array': CavityArray with the best fit model params
+            'labels': labels of the fitted params
+            'x': best fit values of the params
+            'loss': weighted squared error of the best fit
+            'results': scipy.optimize.OptimizeResult of every start sorted by loss
+    """
+    targets = np.asarray(targets)
+    levels = np.arange(len(targets)) if levels is None else np.asarray(levels)
+    weights = np.ones(len(targets)) if weights is None else np.asarray(weights, dtype=float)
+    assert len(levels) == len(targets) == len(weights), "targets, levels and weights should have the same length"
+
+    labels, matrices = sensitivity.structure_matrices(cavity_array)
+    free = free_params(labels, FIT_KEYS if params is None else params)
+    theta = sensitivity.parameters(cavity_array, labels).astype(float)
+    problem = {'matrices': matrices,
+               'theta': theta,
+               'free': free,
+               'targets': targets,
+               'levels': levels,
+               'weights': weights}
+
+    bounds = None if bounds is None else [bounds.get(labels[p], bounds.get(labels[p][0], (None, None))) for p in free]
+    seeds = np.random.SeedSequence(seed).spawn(nstarts)
+    starts = [theta[free]] + [theta[free] + spread * np.random.default_rng(s).normal(size=len(free)) for s in seeds[1:]]
+    args = [(x0, method, bounds, kwargs) for x0 in starts]
+
+    if processes == 1 or nstarts == 1:
+        _init(problem)
+        results = [_minimize(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init, initargs=(problem,)) as pool:
+            results = list(pool.map(_minimize, *zip(*args)))
+    results.sort(key=lambda result: result.fun)
+
+    model_params = copy.deepcopy(cavity_array.model_params)
+    for p, val in zip(free, results[0].x):
+        sensitivity.set_parameter(model_params, labels[p], val)
+    fitted = multi_cavity.CavityArray(cavity_array.num_cavities, cavity_array.num_photons, model_params,
+                                      cavity_array.periodic, cavity_array.precision, cavity_array.residual_tol,
+                                      cavity_array.edges, storage=cavity_array.storage,
+                                      storage_tol=cavity_array.storage_tol, storage_k=cavity_array.storage_k)
+    fitted.site_order = cavity_array.site_order
+    return {'cavity_array': fitted,
+            'labels': [labels[p] for p in free],
+            'x': results[0].x,
+            'loss': results[0].fun,
+            'results': results}
+
+def free_params(labels, params):
+    """Returns the indices into labels of params given as keys or (key, idx) labels"""
+    params = set(param if isinstance(param, str) else tuple(param) for param in params)
+    free = [p for p, label in enumerate(labels) if label in params or label[0] in params]
+    assert len(free), "No model params to fit"
+    return np.array(free)
+
+def loss(x, problem):
+    """Weighted squared error of the energy levels and its gradient
+    Args:
+        x: values of the fitted params
+        problem: dict of the fit problem, see fit
+    Returns:
+        (loss, gradient with respect to x)
+    """
+    theta = problem['theta'].copy()
+    theta[problem['free']] = x
+    matrices = problem['matrices']
+    H = sensitivity.assemble(matrices, theta).toarray()
+    eig_vals, eig_vecs = np.linalg.eig(H)
+    order = np.argsort(np.real(eig_vals), kind='stable')
+    eig_vals, eig_vecs = eig_vals[order], eig_vecs[:, order]
+
+    J = sensitivity.jacobian(eig_vals, eig_vecs, [matrices[p] for p in problem['free']])
+    E, J = eig_vals[problem['levels']], J[problem['levels']]
+    w, targets = problem['weights'], problem['targets']
+    if np.isrealobj(targets):
+        r = np.real(E) - targets
+        return np.sum(w * r**2), 2 * (w * r) @ np.real(J)
+    r = E - targets
+    return np.sum(w * np.abs(r)**2), 2 * np.real((w * np.conj(r)) @ J)
+
+def _init(problem):
+    """Process initializer storing the fit problem"""
+    global _problem
+    _problem = problem
+
+def _minimize(x0, method, bounds, kwargs):
+    """Runs scipy.optimize.minimize on the shared fit problem from x0"""
+    return scipy.optimize.minimize(loss, x0, args=(_problem,), jac=True, method=method, bounds=bounds, **kwargs)
@@ -0,0 +1,149 @@
+"""Lindblad master equation solver exploiting the excitation number structure
+
+The density matrix is stored as blocks rho_{n,m} between the n and m excitation
+sectors. The effective hamiltonian keeps every block within its sector pair and
+the decay jumps only feed rho_{n+1,m+1} into rho_{n,m}, so only the blocks
+reachable from the initial state are evolved and the Liouvillian is assembled
+block by block from sparse kronecker products.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import expm_multiply
+
+import metrics
+import sectors
+
+
+def mesolve(num_cavities, num_photons, model_params, rho0, times, periodic=False, return_states=False, **kwargs):
+    """Solves the Lindblad master equation with cavity and emitter decay
+    Args:
+        num_cavities: number of cavities in the array
+        num_photons: largest number of excitations in rho0
+        model_params: dict of model params, see multi_cavity.CavityArray
+        rho0: initial state; basis state as list of quanta locs or state vector in the
+            num_photons sector, or dict {(n, m): block} of density matrix blocks
+        times: increasing list of times
+        periodic: bool, True for periodic boundary conditions
+        return_states: bool, True to also return the density matrix blocks at each time
+        kwargs: keyword args for multi_cavity.CavityArray, e.g. edges, reorder or precision;
+            with reorder the cavities are relabeled, see CavityArray.site_order
+    Returns:
+        dict containing
+            'times': the times
+            'photon': photon number in each cavity, shape (len(times), num_cavities)
+            'excite': emitter excitations in each cavity, shape (len(times), num_cavities)
+            'rho': list of {(n, m): block} dicts for each time if return_states
+    """
+    times = np.asarray(times, dtype=float)
+    cavity_arrays = sectors.build_sectors(num_cavities, num_photons, model_params, periodic, **kwargs)
+    rho0 = initial_blocks(cavity_arrays, rho0)
+    blocks = reachable_blocks(rho0)
+    L, offsets = liouvillian(cavity_arrays, blocks)
+
+    #vectorized initial state; blocks are flattened row major
+    rho = np.zeros(L.shape[0], dtype=L.dtype)
+    for block, val in rho0.items():
+        rho[offsets[block]:offsets[block] + val.size] = np.ravel(val)
+
+    numbers = [metrics.cavity_numbers(cavity_array) for cavity_array in cavity_arrays]
+    photon = np.zeros((len(times), num_cavities))
+    excite = np.zeros((len(times), num_cavities))
+    states = []
+    t_prev = times[0]
+    for k, t in enumerate(times):
+        if t > t_prev:
+            rho = expm_multiply(L * (t - t_prev), rho)
+        t_prev = t
+        for (n, m), offset in offsets.items():
+            if n != m:
+                continue
+            size = len(cavity_arrays[n].states)
+            pop = np.real(rho[offset:offset + size**2].reshape(size, size).diagonal())
+            photon[k] += pop @ numbers[n][0]
+            excite[k] += pop @ numbers[n][1]
+        if return_states:
+            states.append(unpack(cavity_arrays, offsets, rho))
+
+    result = {'times': times, 'photon': photon, 'excite': excite}
+    if return_states:
+        result['rho'] = states
+    return result
+
+def initial_blocks(cavity_arrays, rho0):
+    """
+    Args:
+        cavity_arrays: list of CavityArray objects from sectors.build_sectors
+        rho0: basis state as list of quanta locs, state vector in the top sector or
+            dict {(n, m): block}
+    Returns:
+        dict {(n, m): block} of the initial density matrix
+    """
+    if isinstance(rho0, dict):
+        return {block: np.asarray(val, dtype='complex') for block, val in rho0.items()}
+    n = len(cavity_arrays) - 1
+    if isinstance(rho0, list):
+        rho0 = cavity_arrays[n].states.tovec(rho0)
+    psi = np.asarray(rho0, dtype='complex').ravel()
+    psi = psi / np.linalg.norm(psi)
+    return {(n, n): np.outer(psi, psi.conj())}
+
+def reachable_blocks(rho0):
+    """
+    Args:
+        rho0: dict {(n, m): block}
+    Returns:
+        sorted list of (n, m) blocks reachable from rho0 by decay jumps
+    """
+    blocks = set()
+    for n, m in rho0:
+        blocks.update((n-k, m-k) for k in range(min(n, m) + 1))
+    return sorted(blocks, reverse=True)
+
+def liouvillian(cavity_arrays, blocks):
+    """Block sparse Liouvillian acting on the row major vectorized blocks
+    Args:
+        cavity_arrays: list of CavityArray objects from sectors.build_sectors
+        blocks: list of (n, m) blocks to include; must be closed under decay jumps
+    Returns:
+        (L, offsets) where L is a sparse matrix in the dtype of the cavity arrays and
+        offsets maps each block to its position in the vectorized density matrix
+    """
+    dims = [len(cavity_array.states) for cavity_array in cavity_arrays]
+    H = [cavity_array.hamiltonian_matrix() for cavity_array in cavity_arrays]
+    dtype = np.result_type(*[h.dtype for h in H])
+    I = [sp.identity(dim, dtype=dtype, format='csr') for dim in dims]
+    jumps = [None] + [[(rate, J.astype(dtype)) for loc, rate, J in sectors.jump_operators(cavity_arrays[n], cavity_arrays[n-1])]
+                      for n in range(1, len(cavity_arrays))]
+
+    index = {block: i for i, block in enumerate(blocks)}
+    offsets = {}
+    offset = 0
+    for n, m in blocks:
+        offsets[(n, m)] = offset
+        offset += dims[n] * dims[m]
+
+    L = [[None] * len(blocks) for _ in blocks]
+    for (n, m), i in index.items():
+        #-i(H_n rho - rho H_m^dag)
+        L[i][i] = -1j * (sp.kron(H[n], I[m]) - sp.kron(I[n], H[m].conj()))
+        #decay from the block above
+        if (n+1, m+1) in index and jumps[n+1]:
+            D = 0
+            for (rate, Jn), (_, Jm) in zip(jumps[n+1], jumps[m+1]):
+                D = D + rate * sp.kron(Jn, Jm.conj())
+            L[i][index[(n+1, m+1)]] = D
+    return sp.bmat(L, format='csr', dtype=dtype), offsets
+
+def unpack(cavity_arrays, offsets, rho):
+    """
+    Args:
+        cavity_arrays: list of CavityArray objects from sectors.build_sectors
+        offsets: block offsets returned by liouvillian
+        rho: vectorized density matrix
+    Returns:
+        dict {(n, m): block}
+    """
+    dims = [len(cavity_array.states) for cavity_array in cavity_arrays]
+    return {(n, m): rho[offset:offset + dims[n]*dims[m]].reshape(dims[n], dims[m]).copy()
+            for (n, m), offset in offsets.items()}
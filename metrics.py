@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.sparse as sp
 from typing import List, Tuple, Dict, Union
 
 import multi_cavity
@@ -14,48 +15,49 @@ def participation(cavity_array, normalize=False):
         p = 1/sum_i abs(v_i)^4 where v_i are the eigenvector components
     """
     
-    eig_vals, eig_vecs = cavity_array.eigenstates()
-    p = 1/(np.sum(abs(eig_vecs)**4, axis=0))
+    P = cavity_array.probabilities()
+    p = 1/_column_sum(_square(P))
     if normalize:
-        p = (p-1)/(len(eig_vals)-1)
+        p = (p-1)/(P.shape[0]-1)
     return p
 
 def node_participation(cavity_array, normalize=False):
     """
-    Only for single photon cavity array
     Args:
         cavity_array: multi_cavity.CavityArray object
     Returns:
+        the participation ratio over the cavities, p = 1/sum_i w_i^2 where w_i is the
+        weight of the eigenstate on cavity i, photon and emitters together. For multi
+        photon arrays each quantum of a basis state carries 1/num_photons of the state
+        weight to its cavity, so w_i is the fraction of the quanta in cavity i, e.g.
+        1/2 for each cavity of |c_0 c_1>; the single photon values are unchanged
     """
     
-    eig_vals, eig_vecs = cavity_array.eigenstates()
-    p = np.zeros((cavity_array.num_cavities, eig_vecs.shape[-1]))
-    for state, v_i in zip(cavity_array.states, eig_vecs):
-        cav = state[0][0]
-        p[cav] += abs(v_i)**2
-    p = 1/np.sum(p**2, axis=0)
+    P = cavity_array.probabilities()
+    photon, excite = occupations(cavity_array)
+    p = ((photon + excite).T / cavity_array.num_photons).astype(P.dtype) @ P
+    p = 1/_column_sum(_square(p))
     if normalize:
         p = (p-1)/(cavity_array.num_cavities-1)
     return p
 
 def polariton_participation(cavity_array, normalize=False):
     """
-    Only for single photon cavity array
     Args:
         cavity_array: multi_cavity.CavityArray object
     Returns:
-        participation ratio for cavity or emitter components
+        participation ratio for cavity or emitter components, p = 1/(w_photon^2 + w_emitter^2).
+        For multi photon arrays each quantum of a basis state carries 1/num_photons of the
+        state weight, so w_photon is the fraction of the quanta that are photons, e.g. 1/2
+        for |c_0 e_0,0>; the single photon values are unchanged
     """
     
-    eig_vals, eig_vecs = cavity_array.eigenstates()
-    p = np.zeros((2, eig_vecs.shape[-1]))
-    for state, v_i in zip(cavity_array.states, eig_vecs):
-        cav = state[0][0]
-        if state[0][1] == -1:
-            p[0] += abs(v_i)**2
-        else:
-            p[1] += abs(v_i)**2
-    p = 1/np.sum(p**2, axis=0)
+    P = cavity_array.probabilities()
+    photon, excite = occupations(cavity_array)
+    #photon and emitter quanta of each state
+    S = np.vstack([_column_sum(photon.T), _column_sum(excite.T)]) / cavity_array.num_photons
+    p = S.astype(P.dtype) @ P
+    p = 1/_column_sum(_square(p))
     if normalize:
         p = p-1
     return p
@@ -68,16 +70,9 @@ def photon_expect(cavity_array):
     Returns:
         photon expectation value for each cavity for each eigenstate
     """
-    eig_vals, eig_vecs = cavity_array.eigenstates()
-    expect_vals = np.zeros(( eig_vecs.shape[-1], cavity_array.num_cavities))
-    
-    for i in range(cavity_array.num_cavities):
-        cavity_exp = 0
-        for k, row in enumerate(eig_vecs):
-            _, n = states.number((i,-1), cavity_array.states[k])
-            cavity_exp += n * abs(row)**2
-        expect_vals[:,i] = cavity_exp
-    return expect_vals
+    P = cavity_array.probabilities()
+    photon, _ = occupations(cavity_array)
+    return _dense(photon.T.astype(P.dtype) @ P).T
 
 def excite_expect(cavity_array):
     """
@@ -86,17 +81,9 @@ def excite_expect(cavity_array):
     Returns:
         sum of emitter excitation expectation values at each cavity for each eigenstate
     """
-    eig_vals, eig_vecs = cavity_array.eigenstates()
-    expect_vals = np.zeros(( eig_vecs.shape[-1], cavity_array.num_cavities))
-    
-    for i, cavity in enumerate(cavity_array):
-        cavity_exp = 0
-        for j in range(cavity.num_emitters):
-            for k, row in enumerate(eig_vecs):
-                _, n = states.number((i,j), cavity_array.states[k])
-                cavity_exp += n * abs(row)**2
-        expect_vals[:,i] = cavity_exp
-    return expect_vals
+    P = cavity_array.probabilities()
+    _, excite = occupations(cavity_array)
+    return _dense(excite.T.astype(P.dtype) @ P).T
 
 def expect(cavity_array, locs):
     """
@@ -106,18 +93,32 @@ def expect(cavity_array, locs):
     Returns:
         sum of expectation values at each cavity loc for each eigenstate
     """
-    eig_vals, eig_vecs = cavity_array.eigenstates()
-    expect_vals = np.zeros(eig_vecs.shape[-1])
-
-    for loc in locs:
-        N = np.zeros(len(cavity_array.states))
-        for i, state in enumerate(cavity_array.states):
+    P = cavity_array.probabilities()
+    N = np.zeros(len(cavity_array.states), dtype=P.dtype)
+    for i, state in enumerate(cavity_array.states):
+        for loc in locs:
             _, n = states.number(loc, state)
-            N[i] = n
-        expect_vals += np.abs(eig_vecs.T)**2 @ N
-    return expect_vals
+            N[i] += n
+    return np.asarray(P.T @ N).ravel()
+
 
 
+def level_spacing(cavity_array, ratio=False):
+    """
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+        ratio: bool, True for the ratio of consecutive spacings
+    Returns:
+        spacings of the real part of the energy levels normalized by the mean spacing
+        or, if ratio, r_n = min(s_n, s_n+1)/max(s_n, s_n+1); nan for degenerate levels
+    """
+    eig_vals, eig_vecs = cavity_array.eigenstates()
+    s = np.diff(np.sort(np.real(eig_vals)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if ratio:
+            return np.minimum(s[:-1], s[1:]) / np.maximum(s[:-1], s[1:])
+        return s / np.mean(s)
+
 
 def number(cavity_array, loc, vecs):
     """
@@ -128,9 +129,53 @@ def number(cavity_array, loc, vecs):
     Returns:
         row vectors of N_loc acting on vecs
     """
-    N = np.zeros(len(cavity_array.states))
+    N = np.zeros(len(cavity_array.states), dtype=np.asarray(vecs).real.dtype)
     for i, state in enumerate(cavity_array.states):
         _, n = states.number(loc, state)
         N[i] = n
     return vecs * N
 
+def occupations(cavity_array):
+    """
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+    Returns:
+        (photon, excite) scipy.sparse.csr_matrix with shape (len(states), num_cavities) giving 
+        the number of photons and excited emitters in each cavity for each basis state
+    """
+    rows, photon_cols, excite_cols = [[], []], [], []
+    for k, state in enumerate(cavity_array.states):
+        for loc in state:
+            if loc[1] == -1:
+                rows[0].append(k)
+                photon_cols.append(loc[0])
+            else:
+                rows[1].append(k)
+                excite_cols.append(loc[0])
+    shape = (len(cavity_array.states), cavity_array.num_cavities)
+    photon = sp.csr_matrix((np.ones(len(photon_cols)), (rows[0], photon_cols)), shape=shape)
+    excite = sp.csr_matrix((np.ones(len(excite_cols)), (rows[1], excite_cols)), shape=shape)
+    return photon, excite
+
+def cavity_numbers(cavity_array):
+    """
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+    Returns:
+        (photon, excite) arrays with shape (len(states), num_cavities) giving the
+        number of photons and excited emitters in each cavity for each basis state
+    """
+    photon, excite = occupations(cavity_array)
+    return photon.toarray(), excite.toarray()
+
+
+#helpers for dense or sparse probabilities
+
+def _square(P):
+    return P.power(2) if sp.issparse(P) else P**2
+
+def _column_sum(P):
+    return np.asarray(P.sum(axis=0)).ravel()
+
+def _dense(P):
+    return P.toarray() if sp.issparse(P) else np.asarray(P)
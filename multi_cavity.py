@@ -1,13 +1,21 @@
 import multi_cavity_base
 import states
-from util import isiter, sort_eigenstates
+import solutions
+import eigensolvers
+import compression
+import sensitivity
+import update
+from util import isiter, sort_eigenstates, residuals
 
 import numpy as np
+import scipy.linalg
+import scipy.sparse as sp
 import qutip
 import copy
+import itertools
 
 class CavityArray(multi_cavity_base.CavityArray):
-    def __init__(self, num_cavities, num_photons, model_params, periodic=False):
+    def __init__(self, num_cavities, num_photons, model_params, periodic=False, precision='double', residual_tol=None, edges=None, reorder=False, storage='dense', storage_tol=1e-6, storage_k=8):
         """Create new CavityArray object
         Args:
             num_cavities: number of cavities in the array
@@ -15,20 +23,59 @@ class CavityArray(multi_cavity_base.CavityArray):
             model_params: dict containing
                 'emitters_per_cavity': List or float, number of emitters in each cavity
                 'kappa': List or float, cavity decay rate
-                'hopping': List or float, cavity-cavity hopping rate
+                'hopping': List or float, cavity-cavity hopping rate for each edge
                 'gamma': List or float, emitter decay rate
                 'g': List or float, cavity emitter coupling constants
                 'cavity_freqs': List or float, cavity frequency
                 'emitter_freqs': List or float, emitter frequencies
             periodic: bool, True for periodic boundary conditions
+            precision: 'double' (complex128) or 'single' (complex64) for the hamiltonian,
+                eigenstates and metrics
+            residual_tol: optional tolerance on the relative residual |Hv - Ev|/(|H||v|) of 
+                each eigenpair; if exceeded the eigenstates are recomputed in double precision
+            edges: optional graph of the array as a list of (i, j) pairs, (i, j, hopping)
+                triples or a sparse adjacency matrix of hopping rates; hopping rates given
+                with the edges are used if model_params['hopping'] is None or missing.
+                Default is a nearest neighbor chain, or a ring if periodic
+            reorder: bool, True to relabel the cavities in reverse Cuthill-McKee order to
+                reduce the bandwidth of the hamiltonian; cavity i is input cavity site_order[i]
+            storage: cached eigenvector storage, 'dense', 'prob' (|v_i|^2 in float32), 'sparse'
+                or 'topk'; see compression
+            storage_tol: max discarded weight of each eigenvector for 'sparse' storage
+            storage_k: number of components kept per eigenvector for 'topk' storage
         """
-        super().__init__(num_cavities, num_photons, model_params, periodic)
-        self.states = states.States(self.num_cavities, self.model_params['emitters_per_cavity'], self.num_photons)
+        super().__init__(num_cavities, num_photons, model_params, periodic, precision, residual_tol, edges, reorder,
+                         storage, storage_tol, storage_k)
 
+    @property
+    def states(self):
+        """Returns the states.States basis; generated on first access"""
+        if self._states is None:
+            self._states = states.States(self.num_cavities, self.model_params['emitters_per_cavity'], self.num_photons)
+        return self._states
+
+    @states.setter
+    def states(self, basis):
+        self._states = basis
     
     def hamiltonian(self):
-        H = np.zeros((len(self.states), len(self.states)), dtype='complex')
+        """Returns the hamiltonian as a sparse qutip Qobj; qutip stores it in complex128
+        whatever the precision, use hamiltonian_matrix to keep self.dtype"""
+        return qutip.Qobj(self.hamiltonian_matrix())
+
+    def hamiltonian_matrix(self, dtype=None):
+        """Returns the hamiltonian as a scipy.sparse.csr_matrix in dtype, default self.dtype;
+        hopping terms are assembled from the edges of the array"""
+        dtype = self.dtype if dtype is None else dtype
+        if self.num_photons == 1:
+            return self.single_excitation_hamiltonian(dtype)
+        
+        #hopping neighbors of each cavity
+        neighbors = [[] for _ in range(self.num_cavities)]
+        for (i, j), J in zip(self.edges, self.hopping):
+            neighbors[i].append((j, J))
         
+        rows, cols, vals = [], [], []
         for col, state in enumerate(self.states):
             for loc in set(state):
                 #cavity-emitter interaction terms
@@ -36,19 +83,23 @@ class CavityArray(multi_cavity_base.CavityArray):
                     #a.dag_i * sigma_ij
                     newstate, n = states.create((loc[0], -1), *states.destroy(loc, state))
                     if newstate in self.states:
-                        row = self.states.index(newstate)
-                        H[row][col] += self.cavities[loc[0]].g[loc[1]]
+                        rows.append(self.states.index(newstate))
+                        cols.append(col)
+                        vals.append(self.cavities[loc[0]].g[loc[1]] * n)
                 
                 #hopping terms
                 if loc[1] == -1: #photon in cavity
-                    # a.dag_(i+1) * a_i
-                    newstate, n = states.create((loc[0]+1, -1), *states.destroy(loc, state))
-                    if self.periodic and self.num_cavities > 2: newstate = [(quanta[0]%self.num_cavities, quanta[1]) for quanta in newstate]
-                    if newstate in self.states:
-                        row = self.states.index(newstate)
-                        H[row][col] -= self.hopping[loc[0]] * n
+                    # a.dag_j * a_i for each edge (i, j)
+                    for j, J in neighbors[loc[0]]:
+                        newstate, n = states.create((j, -1), *states.destroy(loc, state))
+                        if newstate in self.states:
+                            rows.append(self.states.index(newstate))
+                            cols.append(col)
+                            vals.append(-J * n)
         
-        H += H.T #add the transpose terms
+        #add the transpose terms
+        rows, cols = rows + cols, cols + rows
+        vals = vals + vals
         
         #add in a.dag a and sigma.dag sigma terms on the diagonal
         for col, state in enumerate(self.states):
@@ -58,18 +109,152 @@ class CavityArray(multi_cavity_base.CavityArray):
                     w = self.cavities[loc[0]].emitter_freqs[loc[1]] - 0.5j * self.cavities[loc[0]].gamma[loc[1]]
                 else:
                     w = self.cavities[loc[0]].cavity_freq - 0.5j * self.cavities[loc[0]].kappa
-                H[col][col] += w * n
+                rows.append(col)
+                cols.append(col)
+                vals.append(w * n)
         
+        H = sp.coo_matrix((vals, (rows, cols)), shape=(len(self.states), len(self.states)), dtype=dtype)
+        return H.tocsr()
+
+    def single_excitation_hamiltonian(self, dtype=None):
+        """Returns the single photon hamiltonian as a scipy.sparse.csr_matrix in dtype, default
+        self.dtype, built directly from the model params; states are ordered cavity by cavity,
+        photon then emitters"""
+        params = self._model_arrays()
+        num_emitters = params['emitters_per_cavity']
+        photon = np.concatenate(([0], np.cumsum(num_emitters + 1)[:-1])).astype(int) #photon state of each cavity
+        dim = int(np.sum(num_emitters + 1))
+        emitter_cavity = np.repeat(np.arange(self.num_cavities), num_emitters)
+        emitter = np.arange(len(emitter_cavity)) + emitter_cavity + 1 #emitter states
         
-        return qutip.Qobj(H)
+        diag = np.zeros(dim, dtype='complex')
+        diag[photon] = params['cavity_freqs'] - 0.5j * params['kappa']
+        diag[emitter] = params['emitter_freqs'] - 0.5j * params['gamma']
+        g = params['g']
+        edges = np.fromiter(itertools.chain.from_iterable(self.edges), dtype=int, count=2*len(self.edges)).reshape(-1, 2)
+        J = params['hopping']
+        
+        rows = np.concatenate((np.arange(dim), emitter, photon[emitter_cavity], photon[edges[:,0]], photon[edges[:,1]]))
+        cols = np.concatenate((np.arange(dim), photon[emitter_cavity], emitter, photon[edges[:,1]], photon[edges[:,0]]))
+        vals = np.concatenate((diag, g, g, -J, -J))
+        return sp.csr_matrix((vals, (rows, cols)), shape=(dim, dim), dtype=self.dtype if dtype is None else dtype)
 
     def eigenstates(self):
-        """Wrapper function for numpy.linalg.eig
-        Returns the eigenvalues and eigenvectors of the Hamiltonian sorted by energy level
+        """Returns the eigenvalues and eigenvectors of the Hamiltonian sorted by energy level
+        in the precision of the cavity array; double precision if the residual check failed
+        The solver is chosen from the model params and recorded in self.solver:
+            'analytic': closed form solution of single photon arrays with uniform model params
+            'eig_banded': banded hermitian solver for banded lossless or uniform loss hamiltonians
+            'eigh', 'eigh-shifted': dense hermitian solver for lossless or uniform loss hamiltonians
+            'eig': numpy.linalg.eig otherwise
+            'update': low-rank update of the previous eigenstates by tune()
+        The eigenvectors are cached in the storage of the cavity array; see compression
         """
         
         if self._eigenstates is None:
-            self._eigenstates = np.linalg.eig(self.hamiltonian())
-            self._eigenstates = sort_eigenstates(*self._eigenstates)
+            if self.num_photons == 1 and self.uniform:
+                eig_vals, eig_vecs = solutions.identical_cavities_eigenstates(self)
+                eig_vals, eig_vecs = eig_vals.astype(self.dtype), eig_vecs.astype(self.dtype)
+                self.solver = 'analytic'
+            else:
+                eig_vals, eig_vecs = self._solve(self.dtype)
+                if self.residual_tol is not None and self.dtype != np.complex128:
+                    if np.max(residuals(self.hamiltonian_matrix(np.complex128), eig_vals, eig_vecs)) > self.residual_tol:
+                        eig_vals, eig_vecs = self._solve(np.complex128)
+                eig_vals, eig_vecs = sort_eigenstates(eig_vals, eig_vecs)
+            eig_vecs, self.discarded_weight = compression.compress(eig_vecs, self.storage, self.storage_tol, self.storage_k)
+            self._eigenstates = eig_vals, eig_vecs
         
         return self._eigenstates
+
+    def eigenstates_window(self, emin, emax):
+        """Eigenstates with real energy in (emin, emax]
+        With uniform loss only the eigenstates in the window are computed, using the banded
+        solver if the hamiltonian is banded; otherwise all eigenstates are computed and filtered
+        Returns the eigenvalues and eigenvectors sorted by energy level; the eigenvectors are
+        in the storage of the cavity array only if taken from the cached eigenstates
+        """
+        if self.kind == 'general' or self._eigenstates is not None:
+            eig_vals, eig_vecs = self.eigenstates()
+            mask = (np.real(eig_vals) > emin) & (np.real(eig_vals) <= emax)
+            return eig_vals[mask], eig_vecs[:, mask]
+        
+        loss = self.loss()
+        H = self.hamiltonian_matrix() + 0.5j * loss * sp.identity(len(self.states), dtype=self.dtype)
+        order = eigensolvers.banded_order(H)
+        if eigensolvers.use_banded(H, order[1]):
+            eig_vals, eig_vecs = eigensolvers.eigh_banded(H, (emin, emax), self.dtype, order)
+        else:
+            H = H.toarray().astype(self.dtype)
+            eig_vals, eig_vecs = scipy.linalg.eigh(H, subset_by_value=(emin, emax))
+        return eig_vals - 0.5j * loss, eig_vecs
+
+    def tune(self, key, index, value, max_rank=8):
+        """Sets one model param and updates or clears the cached eigenstates
+        A cavity or emitter frequency change of a lossless or uniform loss array only changes
+        the diagonal of the hamiltonian at the states with quanta at that loc; with at most
+        max_rank such states the cached eigenstates are updated with update.diagonal_update.
+        Otherwise, or if the update is ill-conditioned, the cache is cleared and the next
+        eigenstates() call does a full solve
+        Args:
+            key: model params key, one of sensitivity.KEYS
+            index: cavity, (cavity, emitter) pair for the per emitter params or edge for hopping
+            value: new value of the param
+            max_rank: max number of changed diagonal elements for the low-rank update
+        """
+        assert key in sensitivity.KEYS, "key should be one of {}, got '{}'".format(sensitivity.KEYS, key)
+        label = (key, tuple(index) if isiter(index) else index)
+        if key == 'hopping':
+            assert 0 <= index < len(self.edges), "edge index should be in [0, {}), got {}".format(len(self.edges), index)
+        elif key in ['cavity_freqs', 'kappa']:
+            assert 0 <= index < self.num_cavities, "cavity index should be in [0, {}), got {}".format(self.num_cavities, index)
+        else:
+            assert isinstance(label[1], tuple) and len(label[1]) == 2, "index of '{}' should be a (cavity, emitter) pair, got {}".format(key, index)
+            i, j = label[1]
+            assert 0 <= i < self.num_cavities and 0 <= j < self.model_params['emitters_per_cavity'][i], \
+                "no emitter {} in cavity {}".format(j, i)
+        old = sensitivity.get_parameter(self.model_params, label)
+        sensitivity.set_parameter(self.model_params, label, value)
+        self.cavities = None #rebuilt from the model params on next access
+        self._arrays = None
+        eigenstates, self._eigenstates = self._eigenstates, None
+        if eigenstates is None or key not in ['cavity_freqs', 'emitter_freqs'] or self.storage != 'dense' or self.kind == 'general':
+            return
+        
+        loc = (index, -1) if key == 'cavity_freqs' else label[1]
+        n = np.array([state.count(loc) for state in self.states])
+        sites = np.nonzero(n)[0]
+        if len(sites) > max_rank:
+            return
+        result = update.diagonal_update(*eigenstates, sites, (value - old) * n[sites])
+        if result is not None:
+            self._eigenstates = result[0].astype(self.dtype), result[1].astype(self.dtype)
+            self.solver = 'update'
+
+    def loss(self):
+        """Returns the uniform decay rate of every basis state, num_photons times the loss
+        of each cavity and emitter, or None if the losses are not uniform"""
+        loss = eigensolvers.uniform_loss(self.model_params)
+        return None if loss is None else loss * self.num_photons
+
+    def _solve(self, dtype):
+        """Eigenstates of the hamiltonian in the given dtype using the solver for self.kind
+        Lossless and uniform loss hamiltonians use the hermitian solvers on H + 0.5j*loss,
+        banded if the bandwidth is small; all others use numpy.linalg.eig. The hamiltonian is
+        assembled in double precision and rounded to dtype only for the solve
+        """
+        H = self.hamiltonian_matrix(np.complex128)
+        kind = self.kind
+        if kind == 'general':
+            self.solver = 'eig'
+            return np.linalg.eig(H.toarray().astype(dtype))
+        
+        loss = self.loss()
+        order = eigensolvers.banded_order(H)
+        if eigensolvers.use_banded(H, order[1]):
+            self.solver = 'eig_banded'
+            A = H + 0.5j * loss * sp.identity(len(self.states), dtype=H.dtype)
+            eig_vals, eig_vecs = eigensolvers.eigh_banded(A, dtype=dtype, order=order)
+            return eig_vals - 0.5j * loss, eig_vecs
+        self.solver = 'eigh' if kind == 'hermitian' else 'eigh-shifted'
+        return eigensolvers.eigh_shifted(H, loss, dtype)
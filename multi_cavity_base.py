@@ -1,12 +1,15 @@
 import single_cavity
+import topology
+import compression
+import eigensolvers
 from util import isiter
 
 import numpy as np
 from collections import Sequence
-import copy
+import itertools
 
 class CavityArray(Sequence):
-    def __init__(self, num_cavities, num_photons, model_params, periodic=False):
+    def __init__(self, num_cavities, num_photons, model_params, periodic=False, precision='double', residual_tol=None, edges=None, reorder=False, storage='dense', storage_tol=1e-6, storage_k=8):
         """Create new CavityArray object as a sequence of single_cavity objects
         Args:
             num_cavities: number of cavities in the array
@@ -14,78 +17,199 @@ class CavityArray(Sequence):
             model_params: dict containing
                 'emitters_per_cavity': List or float, number of emitters in each cavity
                 'kappa': List or float, cavity decay rate
-                'hopping': List or float, cavity-cavity hopping rate
+                'hopping': List or float, cavity-cavity hopping rate for each edge
                 'gamma': List or float, emitter decay rate
                 'g': List or float, cavity emitter coupling constants
                 'cavity_freqs': List or float, cavity frequency
                 'emitter_freqs': List or float, emitter frequencies
             periodic: bool, True for periodic boundary conditions
+            precision: 'double' (complex128) or 'single' (complex64) for the hamiltonian,
+                eigenstates and metrics
+            residual_tol: optional tolerance on the relative residual |Hv - Ev|/(|H||v|) of 
+                each eigenpair; if exceeded the eigenstates are recomputed in double precision
+            edges: optional graph of the array as a list of (i, j) pairs, (i, j, hopping)
+                triples or a sparse adjacency matrix of hopping rates; hopping rates given
+                with the edges are used if model_params['hopping'] is None or missing.
+                Default is a nearest neighbor chain, or a ring if periodic
+            reorder: bool, True to relabel the cavities in reverse Cuthill-McKee order to
+                reduce the bandwidth of the hamiltonian; cavity i is input cavity site_order[i]
+            storage: cached eigenvector storage, 'dense', 'prob' (|v_i|^2 in float32), 'sparse'
+                or 'topk'; see compression
+            storage_tol: max discarded weight of each eigenvector for 'sparse' storage
+            storage_k: number of components kept per eigenvector for 'topk' storage
         """
     
         #set object attributes
         self.num_cavities = num_cavities
         self.num_photons = num_photons
         self.periodic = periodic
+        assert precision in PRECISIONS, "precision should be one of {}, got '{}'".format(list(PRECISIONS), precision)
+        self.precision = precision
+        self.dtype = PRECISIONS[precision]
+        self.residual_tol = residual_tol
+        assert storage in compression.STORAGES, "storage should be one of {}, got '{}'".format(compression.STORAGES, storage)
+        self.storage = storage
+        self.storage_tol = storage_tol
+        self.storage_k = storage_k
+        
+        #array graph
+        if edges is None:
+            self.edges = topology.chain_edges(self.num_cavities, self.periodic)
+        else:
+            self.edges, edge_hopping = topology.parse_edges(edges, self.num_cavities)
+            if edge_hopping is not None and model_params.get('hopping') is None:
+                model_params = dict(model_params, hopping=edge_hopping)
     
-        self.model_params = setup_model_params(self.num_cavities, model_params, self.periodic)
-        self.cavities = setup_cavities(self.num_cavities, self.model_params)
+        self.model_params = setup_model_params(self.num_cavities, model_params, self.periodic, self.edges)
+        self.site_order = np.arange(self.num_cavities)
+        if reorder:
+            self.site_order = topology.rcm_order(self.num_cavities, self.edges)
+            self.model_params, self.edges = reorder_sites(self.model_params, self.edges, self.site_order)
+        self._cavities = None #single cavities are built on first access
+        self._arrays = None #flat model params, see model_arrays
         self.states = None
         
         #caching eigenstates
         self._eigenstates = None
+        self.discarded_weight = None #weight of each eigenvector dropped by the storage
+        self.solver = None #eigensolver used for the cached eigenstates
         
     #sequence class methods
     def __len__(self): return self.num_cavities
     def __getitem__(self, i): return self.cavities[i]
 
+    @property
+    def cavities(self):
+        """Returns the list of single_cavity objects; built from the model params on first
+        access, set to None to rebuild them after changing the model params"""
+        if self._cavities is None:
+            self._cavities = setup_cavities(self.num_cavities, self.model_params)
+        return self._cavities
+
+    @cavities.setter
+    def cavities(self, cavities):
+        self._cavities = cavities
+
+    def _model_arrays(self):
+        """Returns the model params flattened by model_arrays; built on first access, set
+        self._arrays to None after changing the model params"""
+        if self._arrays is None:
+            self._arrays = model_arrays(self.model_params)
+        return self._arrays
+
     @property
     def hopping(self): 
         """Returns the cavity-cavity hopping rate"""
         return self.model_params['hopping']
     
+    @property
+    def uniform(self):
+        """Returns True if the array is a chain or ring with identical cavity, emitter and 
+        hopping parameters"""
+        return self.edges == topology.chain_edges(self.num_cavities, self.periodic) and is_uniform(self.model_params)
+    
+    @property
+    def kind(self):
+        """Returns the structure of the hamiltonian from the model params; 'hermitian',
+        'shifted' (hermitian minus a uniform imaginary loss) or 'general'"""
+        return eigensolvers.classify(self.model_params)
+    
     def hamiltonian(self):
         pass
 
     def eigenstates(self):
         pass
 
+    def probabilities(self):
+        """Returns |v_i|^2 of the eigenvector components (columns); a scipy.sparse.csc_matrix
+        for 'sparse' and 'topk' storage"""
+        _, eig_vecs = self.eigenstates()
+        return compression.probabilities(eig_vecs, self.storage)
+
+#complex dtype for each precision
+PRECISIONS = {'double': np.complex128, 'single': np.complex64}
+
 #CavityArray setup functions
 
-def setup_model_params(num_cavities, input_model_params, periodic):
+#model params keys in setup order, starting with emitters per cavity
+MODEL_KEYS = ['emitters_per_cavity', 'kappa', 'hopping', 'gamma', 'emitter_freqs', 'cavity_freqs', 'g']
+#model params with one value per emitter
+EMITTER_KEYS = ['gamma', 'g', 'emitter_freqs']
+
+def setup_model_params(num_cavities, input_model_params, periodic, edges=None):
     """Helper function to setup and validate input model parameters
+    hopping has one entry per edge; edges default to a chain, or a ring if periodic
+    Returns lists, with one list per cavity for the emitter params; the input lists are
+    copied, not shared
     """
-    keys = ['emitters_per_cavity', #start with emitters per cavity
-            'kappa',
-            'hopping',
-            'gamma',
-            'emitter_freqs',
-            'cavity_freqs',
-            'g']
-    emitter_keys = ['gamma', 'g', 'emitter_freqs']
+    if edges is None:
+        edges = topology.chain_edges(num_cavities, periodic)
+    keys = MODEL_KEYS
+    emitter_keys = EMITTER_KEYS
     model_params = dict.fromkeys(keys)
     for key in keys:
-        vals = copy.deepcopy(input_model_params[key])
+        vals = input_model_params[key]
         expected_length = num_cavities #length  of list
-        if key == 'hopping' and (not periodic or num_cavities <= 2):
-            expected_length -= 1
-        expected_length = max(0, expected_length)
-        
-        if not isiter(vals): #then convert to list
-            vals = [vals] * expected_length
-        
-        #validate len of list
-        assert len(vals) == expected_length, "The '{}' list should have length {}, got {}".format(key, expected_length, len(vals))
+        if key == 'hopping':
+            expected_length = len(edges)
         
         if key in emitter_keys:
+            num_emitters = model_params['emitters_per_cavity']
+            if not isiter(vals): #then convert to one list per cavity
+                model_params[key] = [[vals] * n for n in num_emitters]
+                continue
+            vals = vals.tolist() if isinstance(vals, np.ndarray) else vals
+            assert len(vals) == expected_length, "The '{}' list should have length {}, got {}".format(key, expected_length, len(vals))
+            vals = [list(cavity_vals) if isiter(cavity_vals) else [cavity_vals] * n for cavity_vals, n in zip(vals, num_emitters)]
             for i in range(num_cavities):
-                expected_length = model_params['emitters_per_cavity'][i]
-                if not isiter(vals[i]):
-                    vals[i] = [vals[i]] * expected_length
-                
-                assert len(vals[i]) == expected_length, "The {}th cavity '{}' list should have length {}, got {}".format(i, key, expected_length, len(vals[i]))
+                assert len(vals[i]) == num_emitters[i], "The {}th cavity '{}' list should have length {}, got {}".format(i, key, num_emitters[i], len(vals[i]))
+        else:
+            #convert to list
+            vals = (vals.tolist() if isinstance(vals, np.ndarray) else list(vals)) if isiter(vals) else [vals] * expected_length
+            assert len(vals) == expected_length, "The '{}' list should have length {}, got {}".format(key, expected_length, len(vals))
         model_params[key] = vals
     return model_params
-    
+
+def model_arrays(model_params):
+    """Helper function to flatten the model params into numpy arrays
+    Returns:
+        dict of float arrays, int for 'emitters_per_cavity', with the emitter params
+        concatenated cavity by cavity
+    """
+    arrays = {}
+    count = sum(model_params['emitters_per_cavity'])
+    for key, vals in model_params.items():
+        if key in EMITTER_KEYS:
+            arrays[key] = np.fromiter(itertools.chain.from_iterable(vals), dtype=float, count=count)
+        else:
+            arrays[key] = np.array(vals, dtype=int if key == 'emitters_per_cavity' else float)
+    return arrays
+
+def reorder_sites(model_params, edges, order):
+    """Helper function to relabel the cavities
+    Args:
+        model_params: validated model params
+        edges: list of (i, j) pairs
+        order: permutation; new cavity k is old cavity order[k]
+    Returns:
+        relabeled (model_params, edges)
+    """
+    new_index = np.empty(len(order), dtype=int)
+    new_index[order] = np.arange(len(order))
+    model_params = {key: (vals if key == 'hopping' else [vals[k] for k in order]) for key, vals in model_params.items()}
+    edges = [(int(new_index[i]), int(new_index[j])) for i, j in edges]
+    return model_params, edges
+
+def is_uniform(model_params):
+    """Returns True if the model params are identical for every cavity, emitter and hopping
+    """
+    for key in ['emitters_per_cavity', 'kappa', 'hopping', 'cavity_freqs']:
+        if len(set(model_params[key])) > 1:
+            return False
+    for key in EMITTER_KEYS:
+        if len(set(val for vals in model_params[key] for val in vals)) > 1:
+            return False
+    return True
 
 def setup_cavities(num_cavities, model_params):
     """Helper function to setup list of single cavities
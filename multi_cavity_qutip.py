@@ -7,8 +7,8 @@ import qutip
 import copy
 
 class CavityArray(multi_cavity_base.CavityArray):
-    def __init__(self, num_cavities, num_photons, model_params, periodic=False):
-        super().__init__(num_cavities, num_photons, model_params, periodic)
+    def __init__(self, num_cavities, num_photons, model_params, periodic=False, edges=None):
+        super().__init__(num_cavities, num_photons, model_params, periodic, edges=edges)
         
         self.dim = (num_photons+1)**num_cavities*2**np.sum(self.model_params['emitters_per_cavity'])
         self.states = states_qutip.States(self)
@@ -46,14 +46,9 @@ class CavityArray(multi_cavity_base.CavityArray):
                 H += cavity.emitter_freqs[j] * s.dag() * s + cavity.g[j] * (a.dag()*s + s.dag() * a)
         
         #hopping terms
-        a = self.a(0)
-        for i, J in enumerate(self.hopping):
-            if self.periodic and self.num_cavities > 2 and i == len(self.hopping):
-                a1 = self.a(0)
-            else:
-                a1 = self.a(i+1)
+        for (i, j), J in zip(self.edges, self.hopping):
+            a, a1 = self.a(i), self.a(j)
             H -= J * (a.dag()*a1 + a1.dag()*a)
-            a = a1
         return H
 
     def eigenstates(self):
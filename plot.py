@@ -2,6 +2,7 @@ import numpy as np
 import qutip
 from typing import List, Tuple, Dict, Union
 import copy
+import itertools
 from matplotlib import pyplot as plt
 from matplotlib.figure import Figure
 from matplotlib.animation import FuncAnimation
@@ -11,6 +12,8 @@ import single_cavity
 import multi_cavity
 from util import *
 import metrics
+import time_evolution
+import compression
 
 #plotting functions:
 #  participation
@@ -18,6 +21,7 @@ import metrics
 #  eigenvectors
 #  eigenvalues
 #  occupancy
+#  occupancy_animation
 
 def participation(cavity_array, ax=None, normalize = False, **kwargs):
     """
@@ -110,6 +114,10 @@ def eigenvectors(cavity_array, eigenvectors=None, axes=None, kind='line', prob=T
     x = range(eig_vecs.shape[0])
     if eigenvectors is not None:
         eig_vecs = eig_vecs[:,eigenvectors]
+    eig_vecs = compression.todense(eig_vecs)
+    if cavity_array.storage == 'prob':
+        assert prob, "eigenvector components are not stored with storage 'prob'"
+        eig_vecs = np.sqrt(eig_vecs) #magnitudes
     
     #if axes provided
     if axes is not None:
@@ -241,3 +249,79 @@ def cavity_occupancy(cavity_array, eigenvectors=None, axes=None, kind='bar', **k
     return fig
 
 
+#############################################################################################################
+#time evolution animation
+
+def occupancy_frames(cavity_array, psi0, times):
+    """Generator for the cavity occupancy of the time evolved state
+    Args:
+        cavity_array: multi_cavity.CavityArray
+        psi0: initial state; basis state as list of quanta locs or state vector
+        times: iterable of times
+    Yields:
+        (t, photon, excite) where photon and excite are the photon and excited emitter
+        occupancy of each cavity at time t
+    """
+    if isinstance(psi0, list):
+        psi0 = cavity_array.states.tovec(psi0)
+    photon, excite = metrics.cavity_numbers(cavity_array)
+    times, evo_times = itertools.tee(times)
+    frames = time_evolution.evolve(cavity_array.hamiltonian_matrix(), psi0, evo_times, cavity_array.kind, cavity_array.dtype)
+    for t, psi in zip(times, frames):
+        prob = np.abs(psi)**2
+        yield t, prob @ photon, prob @ excite
+
+def occupancy_animation(cavity_array, psi0, times, filename=None, writer='ffmpeg', fps=30, **kwargs):
+    """
+    Animation of the cavity occupancy as the state evolves; frames are computed lazily
+    and only the bar heights are redrawn so memory does not grow with the number of frames
+    Args:
+        cavity_array: multi_cavity.CavityArray
+        psi0: initial state; basis state as list of quanta locs or state vector
+        times: iterable of times
+        filename: optional file to write the animation to, e.g. .mp4 or .gif
+        writer: matplotlib MovieWriter or name; default 'ffmpeg' pipes each frame to the encoder
+        fps: frames per second of the written file
+        kwargs: keyword args for Figure, Figure.subplots, axes.bar and Animation.save
+    Returns:
+        FuncAnimation object
+    """
+    kw = kwargs_sep(Figure, kwargs)
+    fig = Figure(**kw)
+    kw = kwargs_sep(fig.subplots, kwargs)
+    ax = fig.subplots(**kw)
+    ax.set_xlabel('Cavity')
+    ax.set_ylabel('Occupancy')
+    ax.set_ylim(0, cavity_array.num_photons)
+    x = range(cavity_array.num_cavities)
+    if cavity_array.num_cavities < 10:
+        ax.set_xticks(x)
+    
+    kw = kwargs_sep(ax.bar, kwargs)
+    zeros = np.zeros(cavity_array.num_cavities)
+    ph_bars = ax.bar(x, zeros, label='photon', **kw)
+    em_bars = ax.bar(x, zeros, bottom=zeros, label='emitters', **kw)
+    text = ax.text(0.02, 0.95, '', transform=ax.transAxes)
+    ax.legend(loc='upper right')
+    artists = list(ph_bars) + list(em_bars) + [text]
+    
+    def init():
+        return artists
+    
+    def update(frame):
+        t, ph_vec, em_vec = frame
+        for ph_bar, em_bar, ph, em in zip(ph_bars, em_bars, ph_vec, em_vec):
+            ph_bar.set_height(ph)
+            em_bar.set_y(ph)
+            em_bar.set_height(em)
+        text.set_text('t = {:.3g}'.format(t))
+        return artists
+    
+    save_count = len(times) if hasattr(times, '__len__') else None
+    anim = FuncAnimation(fig, update, frames=occupancy_frames(cavity_array, psi0, times), init_func=init,
+                         save_count=save_count, blit=True, repeat=False, cache_frame_data=False)
+    if filename is not None:
+        kw = kwargs_sep(anim.save, kwargs)
+        kw.update(writer=writer, fps=fps)
+        anim.save(filename, **kw)
+    return anim
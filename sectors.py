@@ -0,0 +1,65 @@
+"""Excitation number sectors of a cavity array and the decay jumps connecting them"""
+
+import scipy.sparse as sp
+
+import multi_cavity
+import states
+
+
+def build_sectors(num_cavities, num_photons, model_params, periodic=False, **kwargs):
+    """Creates a multi_cavity.CavityArray for each excitation number
+    Args:
+        num_cavities: number of cavities in the array
+        num_photons: largest number of excitations
+        model_params: dict of model params, see multi_cavity.CavityArray
+        periodic: bool, True for periodic boundary conditions
+        kwargs: keyword args for multi_cavity.CavityArray, e.g. edges
+    Returns:
+        list of CavityArray objects; the nth entry holds the n excitation sector
+    """
+    return [multi_cavity.CavityArray(num_cavities, n, model_params, periodic, **kwargs) for n in range(num_photons+1)]
+
+def decay_channels(cavity_array):
+    """
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+    Returns:
+        list of (loc, rate) for every cavity and emitter with non-zero decay rate
+    """
+    channels = []
+    for i, cavity in enumerate(cavity_array):
+        if cavity.kappa != 0:
+            channels.append(((i, -1), cavity.kappa))
+        for j in range(cavity.num_emitters):
+            if cavity.gamma[j] != 0:
+                channels.append(((i, j), cavity.gamma[j]))
+    return channels
+
+def jump_operator(loc, upper, lower):
+    """Lowering operator at loc from the upper sector into the lower sector
+    Args:
+        loc: (cavity, emitter) tuple
+        upper: states.States of the n excitation sector
+        lower: states.States of the n-1 excitation sector
+    Returns:
+        scipy.sparse.csr_matrix of shape (len(lower), len(upper))
+    """
+    rows, cols, vals = [], [], []
+    for col, state in enumerate(upper):
+        newstate, n = states.destroy(loc, state)
+        if n != 0:
+            rows.append(lower.index(newstate))
+            cols.append(col)
+            vals.append(n)
+    return sp.csr_matrix((vals, (rows, cols)), shape=(len(lower), len(upper)), dtype='complex')
+
+def jump_operators(upper, lower):
+    """
+    Args:
+        upper: multi_cavity.CavityArray of the n excitation sector
+        lower: multi_cavity.CavityArray of the n-1 excitation sector
+    Returns:
+        list of (loc, rate, J) for each decay channel where sqrt(rate) * J is the
+        collapse operator from upper.states to lower.states
+    """
+    return [(loc, rate, jump_operator(loc, upper.states, lower.states)) for loc, rate in decay_channels(upper)]
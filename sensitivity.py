@@ -0,0 +1,194 @@
+"""Analytic sensitivities of the cavity array spectrum to the model params
+
+The hamiltonian is linear in every model param,
+    H = sum_p theta_p M_p
+with sparse structure matrices M_p: photon and emitter number operators for the
+frequencies (times -0.5j for kappa and gamma), a.dag sigma + h.c. for g and
+-(a.dag_i a_j + h.c.) for the hopping on each edge. With the biorthogonal
+eigendecomposition H = V diag(E) V^-1 the eigenvalue derivatives are
+    dE_k/dtheta_p = (V^-1 M_p V)_kk
+and the eigenvector derivatives
+    dv_k/dtheta_p = sum_{l != k} (V^-1 M_p V)_lk / (E_k - E_l) v_l
+so a single eigendecomposition gives the full jacobian.
+
+Parameters are labeled (key, idx) with idx the cavity, the (cavity, emitter) pair
+or the edge, e.g. ('cavity_freqs', 2), ('g', (2, 0)), ('hopping', 1).
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+import states
+
+#model params keys in the order of the parameter labels
+KEYS = ['cavity_freqs', 'emitter_freqs', 'g', 'hopping', 'kappa', 'gamma']
+
+
+def parameter_labels(cavity_array):
+    """Returns the (key, idx) label of every model param of cavity_array"""
+    labels = []
+    for key in KEYS:
+        if key == 'hopping':
+            labels += [(key, e) for e in range(len(cavity_array.edges))]
+        elif key in ['cavity_freqs', 'kappa']:
+            labels += [(key, i) for i in range(cavity_array.num_cavities)]
+        else:
+            labels += [(key, (i, j)) for i, cavity in enumerate(cavity_array) for j in range(cavity.num_emitters)]
+    return labels
+
+def parameters(cavity_array, labels=None):
+    """Returns the values of the labeled model params as an array"""
+    labels = parameter_labels(cavity_array) if labels is None else labels
+    return np.array([get_parameter(cavity_array.model_params, label) for label in labels])
+
+def get_parameter(model_params, label):
+    """Returns the model param value of label = (key, idx)"""
+    key, idx = label
+    if isinstance(idx, tuple):
+        return model_params[key][idx[0]][idx[1]]
+    return model_params[key][idx]
+
+def set_parameter(model_params, label, value):
+    """Sets the model param value of label = (key, idx) in place"""
+    key, idx = label
+    if isinstance(idx, tuple):
+        model_params[key][idx[0]][idx[1]] = value
+    else:
+        model_params[key][idx] = value
+
+def structure_matrices(cavity_array):
+    """
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+    Returns:
+        (labels, matrices) where matrices[p] is the scipy.sparse.csr_matrix dH/dtheta_p
+        of the parameter labels[p]
+    """
+    labels = parameter_labels(cavity_array)
+    index = {label: p for p, label in enumerate(labels)}
+    triplets = [([], [], []) for _ in labels]
+    def add(label, row, col, val, hermitian=False):
+        rows, cols, vals = triplets[index[label]]
+        rows.append(row)
+        cols.append(col)
+        vals.append(val)
+        if hermitian:
+            rows.append(col)
+            cols.append(row)
+            vals.append(val)
+
+    #hopping neighbors of each cavity
+    neighbors = [[] for _ in range(cavity_array.num_cavities)]
+    for e, (i, j) in enumerate(cavity_array.edges):
+        neighbors[i].append((j, e))
+
+    basis = cavity_array.states
+    for col, state in enumerate(basis):
+        for loc in set(state):
+            _, n = states.number(loc, state)
+            if loc[1] >= 0: #excited emitter
+                add(('emitter_freqs', loc), col, col, n)
+                add(('gamma', loc), col, col, -0.5j * n)
+                #a.dag_i * sigma_ij
+                newstate, m = states.create((loc[0], -1), *states.destroy(loc, state))
+                if newstate in basis:
+                    add(('g', loc), basis.index(newstate), col, m, hermitian=True)
+            else: #photon in cavity
+                add(('cavity_freqs', loc[0]), col, col, n)
+                add(('kappa', loc[0]), col, col, -0.5j * n)
+                # a.dag_j * a_i for each edge (i, j)
+                for j, e in neighbors[loc[0]]:
+                    newstate, m = states.create((j, -1), *states.destroy(loc, state))
+                    if newstate in basis:
+                        add(('hopping', e), basis.index(newstate), col, -m, hermitian=True)
+
+    dim = len(basis)
+    matrices = [sp.csr_matrix(sp.coo_matrix((vals, (rows, cols)), shape=(dim, dim), dtype='complex'))
+                for rows, cols, vals in triplets]
+    return labels, matrices
+
+def assemble(matrices, theta):
+    """Returns the hamiltonian sum_p theta_p M_p as a scipy.sparse.csr_matrix"""
+    H = sp.csr_matrix(matrices[0].shape, dtype='complex')
+    for M, val in zip(matrices, theta):
+        H = H + val * M
+    return H
+
+def degenerate_clusters(eig_vals, tol=1e-8):
+    """Returns lists of the indices of degenerate eigenvalues; eigenvalues closer than
+    tol * max(1, max |E|) are degenerate"""
+    eig_vals = np.asarray(eig_vals)
+    scale = tol * max(1, np.max(np.abs(eig_vals), initial=0))
+    order = np.argsort(np.real(eig_vals), kind='stable')
+    clusters, cluster = [], [order[0]] if len(order) else []
+    for k in order[1:]:
+        if np.min(np.abs(eig_vals[cluster] - eig_vals[k])) < scale:
+            cluster.append(k)
+        else:
+            clusters.append(cluster)
+            cluster = [k]
+    clusters.append(cluster)
+    return [cluster for cluster in clusters if len(cluster) > 1]
+
+def eigenvalue_jacobian(cavity_array, vectors=False, tol=1e-8):
+    """Derivatives of the eigenvalues, and optionally eigenvectors, with respect to every model param
+    Args:
+        cavity_array: multi_cavity.CavityArray object with 'dense' storage
+        vectors: bool, True to also return the eigenvector derivatives
+        tol: relative tolerance for degenerate eigenvalues
+    Returns:
+        (labels, J) with J[k, p] = dE_k/dtheta_p for the eigenvalues sorted by energy level
+        and, if vectors, dV with dV[p] = dV/dtheta_p; see jacobian
+    """
+    assert cavity_array.storage == 'dense', "eigenvector derivatives need 'dense' eigenvector storage"
+    eig_vals, eig_vecs = cavity_array.eigenstates()
+    labels, matrices = structure_matrices(cavity_array)
+    if vectors:
+        J, dV = jacobian(eig_vals, eig_vecs, matrices, True, tol)
+        return labels, J, dV
+    return labels, jacobian(eig_vals, eig_vecs, matrices, False, tol)
+
+def jacobian(eig_vals, eig_vecs, matrices, vectors=False, tol=1e-8):
+    """Eigenvalue and eigenvector derivatives from an eigendecomposition
+    For degenerate eigenvalues the derivatives are the eigenvalues of the perturbation
+    within the degenerate subspace, sorted by real part; the eigenvector derivatives
+    of degenerate eigenvalues are nan
+    Args:
+        eig_vals, eig_vecs: eigenvalues and eigenvectors (columns) of the hamiltonian
+        matrices: list of sparse structure matrices dH/dtheta_p
+        vectors: bool, True to also return the eigenvector derivatives
+        tol: relative tolerance for degenerate eigenvalues
+    Returns:
+        J with J[k, p] = dE_k/dtheta_p or, if vectors, (J, dV) with dV[p] = dV/dtheta_p;
+        dV needs len(matrices) * len(eig_vals)**2 complex entries
+    """
+    eig_vals, V = eig_vals.astype('complex'), eig_vecs.astype('complex')
+    Vinv = np.linalg.inv(V)
+
+    #(V^-1 M_p V)_kk = sum over the nonzeros (i, j) of M_p of Vinv[k, i] M_p[i, j] V[j, k]
+    coos = [M.tocoo() for M in matrices]
+    rows = np.concatenate([M.row for M in coos])
+    cols = np.concatenate([M.col for M in coos])
+    vals = np.concatenate([M.data for M in coos])
+    owner = np.repeat(np.arange(len(coos)), [M.nnz for M in coos])
+    A = sp.csr_matrix((vals, (owner, np.arange(len(vals)))), shape=(len(coos), len(vals)))
+    J = np.asarray(A @ (Vinv.T[rows] * V[cols])).T
+
+    clusters = degenerate_clusters(eig_vals, tol)
+    for cluster in clusters:
+        for p, M in enumerate(matrices):
+            block = Vinv[cluster] @ (M @ V[:, cluster])
+            J[cluster, p] = sorted(np.linalg.eigvals(block), key=np.real)
+    if not vectors:
+        return J
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gaps = 1 / (eig_vals[None, :] - eig_vals[:, None]) #1/(E_k - E_l) at [l, k]
+    gaps[~np.isfinite(gaps)] = 0
+    np.fill_diagonal(gaps, 0)
+    degenerate = [k for cluster in clusters for k in cluster]
+    dV = np.empty((len(matrices),) + V.shape, dtype='complex')
+    for p, M in enumerate(matrices):
+        dV[p] = V @ ((Vinv @ (M @ V)) * gaps)
+        dV[p][:, degenerate] = np.nan
+    return J, dV
@@ -0,0 +1,200 @@
+"""Zero-copy sharing of basis tables and hamiltonians between processes
+
+publish() flattens a multi_cavity.CavityArray's basis, occupation tables and the
+sparse structure of its hamiltonian into plain numpy arrays stored in
+multiprocessing.shared_memory blocks, or in .npy files when a directory is given.
+The returned SharedBasis handle is small and cheap to pickle; worker processes
+call attach() to get read-only views of the arrays without copying or
+deserializing the basis.
+
+Shared memory blocks are owned by the publishing process; workers must be
+started from it (e.g. a multiprocessing pool) and the owner calls unlink() when done.
+"""
+
+import numpy as np
+import os
+import scipy.sparse as sp
+from multiprocessing import shared_memory
+
+import metrics
+import states_base
+
+
+class SharedBasis:
+    def __init__(self, meta, arrays, path=None):
+        """Handle to published basis arrays; use publish() to create
+        Args:
+            meta: dict of cavity array attributes
+            arrays: dict of name: (location, shape, dtype); location is the shared
+                memory name or the .npy file
+            path: directory of the .npy files or None for shared memory
+        """
+        self.meta = meta
+        self.arrays = arrays
+        self.path = path
+        self._blocks = []
+
+    def __getstate__(self):
+        #only the owner keeps the shared memory blocks
+        state = self.__dict__.copy()
+        state['_blocks'] = []
+        return state
+
+    def close(self):
+        """Closes the owner's handles to the shared memory blocks"""
+        for block in self._blocks:
+            block.close()
+
+    def unlink(self):
+        """Closes and frees the shared memory blocks or removes the .npy files"""
+        if self.path is None:
+            for block in self._blocks:
+                block.close()
+                block.unlink()
+        else:
+            for location, shape, dtype in self.arrays.values():
+                os.remove(location)
+        self._blocks = []
+
+    def __enter__(self): return self
+    def __exit__(self, *args): self.unlink()
+
+
+class BasisView(states_base.States):
+    def __init__(self, handle):
+        """Read-only States like view of a published basis
+        a state is a list of quanta locs given as (cavity, emitter) pairs;
+        emitter == -1 means photons is in the cavity
+        Args:
+            handle: SharedBasis returned by publish()
+        """
+        self.meta = handle.meta
+        self._blocks = []
+        for name, (location, shape, dtype) in handle.arrays.items():
+            if handle.path is None:
+                block = _attach_block(location)
+                self._blocks.append(block)
+                arr = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            else:
+                arr = np.load(location, mmap_mode='r')
+            arr.flags.writeable = False
+            setattr(self, name, arr)
+        self._modes = [tuple(mode) for mode in self.modes.tolist()]
+        self._mode_index = {mode: m for m, mode in enumerate(self._modes)}
+
+    #sequence class methods
+    def __len__(self): return self.quanta.shape[0]
+    def __getitem__(self, i): return [self._modes[m] for m in self.quanta[i]]
+    def __contains__(self, state):
+        #states with other numbers of quanta can share a key
+        if len(state) != self.quanta.shape[1] or any(loc not in self._mode_index for loc in state):
+            return False
+        key = self._key(state)
+        i = np.searchsorted(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
+
+    @property
+    def states(self): return [self[i] for i in range(len(self))]
+
+    def index(self, state):
+        """Returns the index of the state"""
+        if state not in self:
+            raise KeyError(tuple(sorted(state)))
+        return int(self.order[np.searchsorted(self.keys, self._key(state))])
+
+    def tovec(self, state, dtype='complex'):
+        vec = np.zeros(len(self), dtype=dtype)
+        vec[self.index(state)] = 1
+        return vec
+
+    def hamiltonian(self):
+        """Returns the hamiltonian as a scipy.sparse.csr_matrix sharing the published arrays"""
+        n = len(self)
+        return sp.csr_matrix((self.data, self.indices, self.indptr), shape=(n, n), copy=False)
+
+    def _key(self, state):
+        quanta = sorted(self._mode_index[loc] for loc in state)
+        return _encode(np.array([quanta], dtype=np.int64).reshape(1, -1), len(self._modes))[0]
+
+    def close(self):
+        """Closes this process's handles to the shared memory blocks"""
+        for block in self._blocks:
+            block.close()
+
+
+def publish(cavity_array, path=None):
+    """Publishes the basis, occupation tables and hamiltonian of cavity_array
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+        path: optional directory for memory mapped .npy files; shared memory if None
+    Returns:
+        SharedBasis handle to pass to worker processes
+    """
+    arrays = basis_tables(cavity_array)
+    meta = {'num_cavities': cavity_array.num_cavities,
+            'num_photons': cavity_array.num_photons,
+            'periodic': cavity_array.periodic,
+            'emitters_per_cavity': list(cavity_array.model_params['emitters_per_cavity'])}
+
+    handle = SharedBasis(meta, {}, path)
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        if path is None:
+            block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+            handle._blocks.append(block)
+            location = block.name
+        else:
+            location = os.path.join(path, name + '.npy')
+            np.save(location, arr)
+        handle.arrays[name] = (location, arr.shape, arr.dtype.str)
+    return handle
+
+def attach(handle):
+    """Returns a read-only BasisView of a published basis"""
+    return BasisView(handle)
+
+def basis_tables(cavity_array):
+    """Flattens the basis and hamiltonian of cavity_array into arrays
+    Args:
+        cavity_array: multi_cavity.CavityArray object
+    Returns:
+        dict containing
+            'modes': (cavity, emitter) of every mode, emitter == -1 for the cavity
+            'quanta': sorted mode index of each quanta for every basis state
+            'keys', 'order': sorted integer keys of the states and their basis index
+            'photon', 'excite': photon and excited emitter number of each cavity for every state
+            'data', 'indices', 'indptr': csr arrays of the hamiltonian
+    """
+    modes = [(i, j) for i, cavity in enumerate(cavity_array) for j in range(-1, cavity.num_emitters)]
+    mode_index = {mode: m for m, mode in enumerate(modes)}
+    quanta = np.array([sorted(mode_index[loc] for loc in state) for state in cavity_array.states],
+                      dtype=np.int32).reshape(len(cavity_array.states), cavity_array.num_photons)
+    keys = _encode(quanta, len(modes))
+    order = np.argsort(keys, kind='stable')
+    photon, excite = metrics.cavity_numbers(cavity_array)
+    H = cavity_array.hamiltonian_matrix()
+    return {'modes': np.array(modes, dtype=np.int32).reshape(-1, 2),
+            'quanta': quanta,
+            'keys': keys[order],
+            'order': order.astype(np.int64),
+            'photon': photon.astype(np.int16),
+            'excite': excite.astype(np.int16),
+            'data': H.data,
+            'indices': H.indices,
+            'indptr': H.indptr}
+
+def _encode(quanta, num_modes):
+    """Encodes rows of sorted mode indices as integers in base num_modes"""
+    assert float(num_modes)**quanta.shape[1] < 2**63, "basis too large to encode states as int64 keys"
+    keys = np.zeros(quanta.shape[0], dtype=np.int64)
+    for col in quanta.T:
+        keys = keys * num_modes + col
+    return keys
+
+def _attach_block(name):
+    """Attaches to a shared memory block without registering it for cleanup in this process"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError: #python < 3.13; the block is already tracked by the owner's resource tracker
+        return shared_memory.SharedMemory(name=name)
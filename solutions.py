@@ -1,15 +1,86 @@
 import numpy as np
 
-#still needs to be verified for non PBC and loss terms
+from util import sort_eigenstates
+
+#single photon spectrum of identical cavities; verified against numerical diagonalization
+#for periodic and open boundaries with loss
 def identical_cavities(num_cavities, emitters_per_cavity, cavity_freq, emitter_freq, hopping, g, periodic = False, kappa=0, gamma=0):
-    if periodic:
-        k =  np.arange(1, num_cavities+1) * 2 * np.pi/num_cavities
-    else:
-        k = np.arange(1, num_cavities+1) * np.pi / (num_cavities + 1)
+    k = wavenumbers(num_cavities, periodic)
+    if emitters_per_cavity == 0:
+        return cavity_freq-1j/2*kappa - 2*hopping*np.cos(k)
     left = 1/2 * (-2*hopping*np.cos(k)+(emitter_freq-1j/2*gamma)+(cavity_freq-1j/2*kappa))
-    right = 1/2 * np.sqrt(abs((2*hopping*np.cos(k)+(emitter_freq-1j/2*gamma)-(cavity_freq-1j/2*kappa)))**2+4*emitters_per_cavity*g**2)
+    right = 1/2 * np.sqrt((2*hopping*np.cos(k)+(emitter_freq-1j/2*gamma)-(cavity_freq-1j/2*kappa)+0j)**2+4*emitters_per_cavity*g**2)
     y1 = left - right
     y2 = np.ones(num_cavities*(max(emitters_per_cavity-1, 0)))*(emitter_freq-1j/2*gamma)
     y3 = left + right
     return np.concatenate((y1,y2,y3))
 
+def wavenumbers(num_cavities, periodic=False):
+    """Returns the photon wavenumbers; arrays of 2 or fewer cavities have open boundaries
+    as in multi_cavity.CavityArray"""
+    if periodic and num_cavities > 2:
+        return np.arange(1, num_cavities+1) * 2 * np.pi/num_cavities
+    return np.arange(1, num_cavities+1) * np.pi / (num_cavities + 1)
+
+def photon_modes(num_cavities, periodic=False):
+    """Returns the normalized photon modes of the hopping matrix as columns;
+    Bloch waves for periodic and standing waves for open boundaries"""
+    k = wavenumbers(num_cavities, periodic)
+    sites = np.arange(num_cavities)[:, None]
+    if periodic and num_cavities > 2:
+        return np.exp(1j * sites * k) / np.sqrt(num_cavities)
+    return np.sqrt(2/(num_cavities+1)) * np.sin((sites+1) * k) + 0j
+
+def identical_cavities_eigenstates(cavity_array):
+    """Analytic single photon eigenstates of an array of identical cavities
+    Args:
+        cavity_array: multi_cavity.CavityArray with one photon and uniform model params
+    Returns:
+        eigenvalues and eigenvectors (columns, in the cavity_array.states basis) sorted by energy level
+    """
+    cavity = cavity_array[0]
+    C, N = cavity_array.num_cavities, cavity.num_emitters
+    hopping = cavity_array.hopping[0] if len(cavity_array.hopping) else 0
+    wc = cavity.cavity_freq - 0.5j * cavity.kappa
+    k = wavenumbers(C, cavity_array.periodic)
+    modes = photon_modes(C, cavity_array.periodic)
+    photon_idx = [cavity_array.states.index([(i, -1)]) for i in range(C)]
+
+    eig_vals = []
+    eig_vecs = []
+    if N == 0:
+        for a, mode in zip(wc - 2*hopping*np.cos(k), modes.T):
+            vec = np.zeros(len(cavity_array.states), dtype='complex')
+            vec[photon_idx] = mode
+            eig_vals.append(a)
+            eig_vecs.append(vec)
+        return sort_eigenstates(np.array(eig_vals), np.array(eig_vecs).T)
+
+    we = cavity.emitter_freqs[0] - 0.5j * cavity.gamma[0]
+    Ng = np.sqrt(N) * cavity.g[0]
+    emitter_idx = np.array([[cavity_array.states.index([(i, j)]) for j in range(N)] for i in range(C)])
+
+    #polaritons: each photon mode couples to the bright emitter combination
+    for a, mode in zip(wc - 2*hopping*np.cos(k), modes.T):
+        root = np.sqrt(((a - we)/2)**2 + Ng**2 + 0j)
+        for branch, y in enumerate([(a + we)/2 - root, (a + we)/2 + root]):
+            amps = [np.array([Ng, y - a]), np.array([y - we, Ng])]
+            amps = max(amps, key=np.linalg.norm)
+            if np.linalg.norm(amps) < 1e-14: #g == 0 and resonant
+                amps = np.array([1, 0]) if branch == 0 else np.array([0, 1])
+            photon, bright = amps / np.linalg.norm(amps)
+            vec = np.zeros(len(cavity_array.states), dtype='complex')
+            vec[photon_idx] = photon * mode
+            vec[emitter_idx] = bright * mode[:, None] / np.sqrt(N)
+            eig_vals.append(y)
+            eig_vecs.append(vec)
+
+    #dark states: emitter combinations orthogonal to the bright one in each cavity
+    phases = np.exp(2j * np.pi * np.outer(np.arange(1, N), np.arange(N)) / N) / np.sqrt(N)
+    for i in range(C):
+        for phase in phases:
+            vec = np.zeros(len(cavity_array.states), dtype='complex')
+            vec[emitter_idx[i]] = phase
+            eig_vals.append(we)
+            eig_vecs.append(vec)
+    return sort_eigenstates(np.array(eig_vals), np.array(eig_vecs).T)
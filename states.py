@@ -16,8 +16,8 @@ class States(states_base.States):
         self.states = states_base.generate_states(num_cavities, emitters_per_cavity, num_photons)
         self._index = {tuple(state): i for i, state in enumerate(self.states)}
     
-    def tovec(self, state):
-        vec = np.zeros(len(self), dtype='complex')
+    def tovec(self, state, dtype='complex'):
+        vec = np.zeros(len(self), dtype=dtype)
         vec[self.index(state)] = 1
         return vec
     
@@ -35,6 +35,8 @@ class States(Sequence):
 
 def generate_states(num_cavities, emitters_per_cavity, num_photons):
     if num_photons == 0: return [[]]
+    if num_photons == 1: #cavity by cavity: photon then emitters
+        return [[(cav, emitter)] for cav in range(num_cavities) for emitter in range(-1, emitters_per_cavity[cav])]
     states = []
     cavity_dist = list(combinations_with_replacement(range(num_cavities), num_photons))
     for cavities in cavity_dist:
@@ -0,0 +1,120 @@
+"""Checks of the streaming accumulators against numpy on the stored realizations"""
+
+import numpy as np
+import pytest
+
+import accumulators
+
+
+def realizations(n=500, shape=(3, 4), seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n,) + shape) * np.arange(1, shape[-1] + 1)
+
+
+def test_running_stats():
+    x = realizations()
+    stats = accumulators.RunningStats()
+    for val in x:
+        stats.add(val)
+    assert stats.count == len(x)
+    assert np.allclose(stats.mean, np.mean(x, axis=0))
+    assert np.allclose(stats.var, np.var(x, axis=0))
+    assert np.allclose(stats.sem, np.std(x, axis=0, ddof=1) / np.sqrt(len(x)))
+
+def test_running_stats_merge():
+    x = realizations()
+    parts = [accumulators.RunningStats() for _ in range(3)]
+    for k, val in enumerate(x):
+        parts[k % 3].add(val)
+    parts[0].merge(parts[1])
+    parts[0].merge(parts[2])
+    parts[0].merge(accumulators.RunningStats())
+    assert np.allclose(parts[0].mean, np.mean(x, axis=0))
+    assert np.allclose(parts[0].var, np.var(x, axis=0))
+
+def test_running_stats_pooled():
+    x = realizations(100)
+    x[3, 0, 0], x[7, 1, 2] = np.nan, np.inf
+    stats = accumulators.RunningStats(pooled=True)
+    for val in x:
+        stats.add(val)
+    finite = x[np.isfinite(x)]
+    assert stats.count == len(finite)
+    assert np.isclose(stats.mean, np.mean(finite)) and np.isclose(stats.var, np.var(finite))
+
+@pytest.mark.parametrize('pooled', [False, True])
+def test_histogram(pooled):
+    x = realizations(300)
+    hist = accumulators.Histogram(-4, 4, bins=16, pooled=pooled)
+    for val in x:
+        hist.add(val)
+    if pooled:
+        expected = np.histogram(x, hist.edges)[0]
+        assert np.array_equal(hist.counts, expected)
+        assert hist.underflow + hist.overflow + np.sum(hist.counts) == x.size
+        assert abs(hist.quantile(0.5) - np.median(x)) <= hist.edges[1] - hist.edges[0]
+    else:
+        for idx in np.ndindex(x.shape[1:]):
+            col = x[(slice(None),) + idx]
+            assert np.array_equal(hist.counts[idx], np.histogram(col, hist.edges)[0])
+            assert hist.underflow[idx] == np.sum(col < -4) and hist.overflow[idx] == np.sum(col >= 4)
+        #quantiles of values inside the bins are accurate to one bin width
+        inside = np.all((x > -4) & (x < 4), axis=0)
+        error = np.abs(hist.quantile(0.3) - np.quantile(x, 0.3, axis=0))
+        assert np.all(error[inside] <= hist.edges[1] - hist.edges[0])
+    assert np.allclose(np.sum(hist.density() * np.diff(hist.edges), axis=-1), 1)
+
+@pytest.mark.parametrize('q', [0.1, 0.5, 0.9])
+def test_quantile(q):
+    x = realizations(4000, (2, 3), seed=1)
+    quantile = accumulators.Quantile(q)
+    for val in x:
+        quantile.add(val)
+    spread = np.std(x, axis=0)
+    assert np.all(np.abs(quantile.value - np.quantile(x, q, axis=0)) < 0.05 * spread)
+
+@pytest.mark.parametrize('q', [0.25, 0.5])
+def test_quantile_pooled(q):
+    """The pooled estimate adds the values one by one; it equals an elementwise estimate
+    on the same stream of scalars"""
+    x = realizations(800, (5,), seed=2)
+    pooled, scalar = accumulators.Quantile(q, pooled=True), accumulators.Quantile(q)
+    for val in x:
+        pooled.add(val)
+        for v in val:
+            scalar.add(v)
+    assert pooled.count == x.size
+    assert np.isclose(pooled.value, scalar.value)
+    assert abs(pooled.value - np.quantile(x, q)) < 0.05 * np.std(x)
+
+def test_quantile_few_values():
+    quantile = accumulators.Quantile(0.5)
+    for val in [3.0, 1.0, 2.0]:
+        quantile.add(val)
+    assert quantile.value == 2.0
+
+def test_ensemble_resume(tmp_path):
+    """An interrupted ensemble resumes from its checkpoint with the same random stream"""
+    def realization():
+        x = np.random.normal(size=3)
+        return {'x': x, 'norm': np.linalg.norm(x)}
+    def make():
+        return {'x': accumulators.RunningStats(), 'norm': [accumulators.RunningStats(pooled=True), accumulators.Histogram(0, 5, 10)]}
+
+    full = accumulators.Ensemble(str(tmp_path / 'full.pkl'), make(), checkpoint_every=10, seed=5).run(realization, 50)
+
+    path = str(tmp_path / 'resumed.pkl')
+    calls = []
+    def interrupted():
+        calls.append(1)
+        if len(calls) > 25:
+            raise KeyboardInterrupt
+        return realization()
+    with pytest.raises(KeyboardInterrupt):
+        accumulators.Ensemble(path, make(), checkpoint_every=10, seed=5).run(interrupted, 50)
+    ensemble = accumulators.Ensemble(path, make(), checkpoint_every=10, seed=99)
+    assert ensemble.count == 20
+    resumed = ensemble.run(realization, 50)
+    assert resumed['x'].count == 50
+    assert np.allclose(resumed['x'].mean, full['x'].mean) and np.allclose(resumed['x'].var, full['x'].var)
+    assert np.array_equal(resumed['norm'][1].counts, full['norm'][1].counts)
@@ -0,0 +1,108 @@
+"""Checks of the batch runner output and of resuming interrupted runs"""
+
+import numpy as np
+import pytest
+
+import batch
+
+FORMATS = {'parquet': 'out.parquet', 'hdf5': 'out.h5', 'zarr': 'out.zarr'}
+
+
+def make_spec():
+    return {'geometry': {'num_cavities': 3, 'num_photons': 1},
+            'model_params': {'emitters_per_cavity': 1, 'kappa': 0.1, 'hopping': 1.0, 'gamma': 0.1,
+                             'g': 0.3, 'emitter_freqs': 0.2},
+            'grid': {'hopping': [0.5, 1.0, 1.5], 'cavity_freqs.spread': [0.1, 0.4]},
+            'rand': {'cavity_freqs': {'center': 0.0, 'spread': 0.1}},
+            'realizations': 2,
+            'metrics': ['energy', 'participation', 'photon_expect'],
+            'chunksize': 3,
+            'seed': 7}
+
+def read_columns(path, fmt):
+    """Returns the output columns as a dict of arrays"""
+    if fmt == 'parquet':
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(path)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    if fmt == 'hdf5':
+        import h5py
+        with h5py.File(path, 'r') as f:
+            return {name: f[name][:] for name in f}
+    import zarr
+    group = zarr.open_group(path, mode='r')
+    return {name: group[name][:] for name in group}
+
+def sort_rows(columns):
+    order = np.lexsort((columns['level'], columns['run']))
+    return {name: values[order] for name, values in columns.items()}
+
+def interrupt(monkeypatch, name, calls):
+    """Makes batch.<name> raise KeyboardInterrupt after calls calls"""
+    original = getattr(batch, name)
+    count = [0]
+    def wrapper(*args):
+        count[0] += 1
+        if count[0] > calls:
+            raise KeyboardInterrupt
+        return original(*args)
+    monkeypatch.setattr(batch, name, wrapper)
+
+
+def test_tasks():
+    tasks = batch.tasks(make_spec())
+    assert not isinstance(tasks, list)
+    tasks = list(tasks)
+    assert [task[0] for task in tasks] == list(range(12))
+    assert tasks[0] == (0, {'hopping': 0.5, 'cavity_freqs.spread': 0.1}, 0)
+    assert tasks[1] == (1, {'hopping': 0.5, 'cavity_freqs.spread': 0.1}, 1)
+    assert tasks[-1] == (11, {'hopping': 1.5, 'cavity_freqs.spread': 0.4}, 1)
+
+@pytest.mark.parametrize('fmt', list(FORMATS))
+def test_output(fmt, tmp_path):
+    path = str(tmp_path / FORMATS[fmt])
+    assert batch.run(make_spec(), path) == path
+    columns = sort_rows(read_columns(path, fmt))
+    assert np.array_equal(columns['run'], np.repeat(np.arange(12), 6))
+    assert np.array_equal(columns['level'], np.tile(np.arange(6), 12))
+    assert {'energy_real', 'energy_imag', 'participation', 'photon_expect_0', 'photon_expect_2',
+            'hopping', 'cavity_freqs_spread', 'realization'} <= set(columns)
+    #runs are reproducible from their seed alone
+    result = batch.run_task(make_spec(), (5, {'hopping': 1.0, 'cavity_freqs.spread': 0.1}, 1))
+    assert np.array_equal(columns['energy_real'][columns['run'] == 5], result['energy_real'])
+
+#interrupted between chunks, or within an append after the columns are written;
+#parquet parts are committed by an atomic rename
+@pytest.mark.parametrize('fmt, name, calls', [(fmt, 'run_task', 7) for fmt in FORMATS]
+                                             + [('hdf5', '_commit', 2), ('zarr', '_commit', 2)])
+def test_resume(fmt, name, calls, tmp_path, monkeypatch):
+    """Rerunning an interrupted spec writes every run exactly once, with the results of
+    an uninterrupted run; an interrupted append is dropped"""
+    path = str(tmp_path / FORMATS[fmt])
+    with monkeypatch.context() as patch:
+        interrupt(patch, name, calls)
+        with pytest.raises(KeyboardInterrupt):
+            batch.run(make_spec(), path)
+    partial = read_columns(path, fmt)
+    assert 0 < len(np.unique(partial['run'])) < 12
+
+    batch.run(make_spec(), path)
+    resumed = sort_rows(read_columns(path, fmt))
+    expected = sort_rows(read_columns(batch.run(make_spec(), str(tmp_path / ('full_' + FORMATS[fmt]))), fmt))
+    assert np.array_equal(np.unique(resumed['run'], return_counts=True)[1], np.full(12, 6))
+    assert resumed.keys() == expected.keys()
+    for key in expected:
+        assert np.array_equal(resumed[key], expected[key])
+
+    #a complete output is left as is
+    batch.run(make_spec(), path)
+    assert len(read_columns(path, fmt)['run']) == 72
+
+@pytest.mark.parametrize('fmt', list(FORMATS))
+def test_spec_mismatch(fmt, tmp_path):
+    path = str(tmp_path / FORMATS[fmt])
+    batch.run(make_spec(), path)
+    spec = make_spec()
+    spec['seed'] = 8
+    with pytest.raises(AssertionError):
+        batch.run(spec, path)
@@ -0,0 +1,52 @@
+"""Checks of the dispersive effective model against the full single photon model"""
+
+import numpy as np
+import pytest
+
+import multi_cavity
+import dispersive
+
+
+def detuned_array(num_cavities, periodic=True, seed=0):
+    rng = np.random.default_rng(seed)
+    model_params = {'emitters_per_cavity': 2, 'kappa': 0.1, 'hopping': 0.5, 'gamma': 0.05,
+                    'g': rng.uniform(0.3, 0.6, (num_cavities, 2)).tolist(),
+                    'cavity_freqs': rng.uniform(-0.2, 0.2, num_cavities).tolist(),
+                    'emitter_freqs': rng.uniform(4.5, 5.5, (num_cavities, 2)).tolist()}
+    return multi_cavity.CavityArray(num_cavities, 1, model_params, periodic)
+
+def photon_like(cavity_array):
+    """Eigenvalues of the full model closest to the bare cavity frequencies"""
+    eig_vals = np.linalg.eigvals(cavity_array.hamiltonian_matrix().toarray())
+    return np.sort_complex(eig_vals[np.argsort(np.abs(np.real(eig_vals)))[:cavity_array.num_cavities]])
+
+
+@pytest.mark.parametrize('num_cavities', [1, 3, 8])
+def test_orders(num_cavities):
+    """Each order improves on the last and the converged eigenstates are exact"""
+    cavity_array = detuned_array(num_cavities)
+    exact = photon_like(cavity_array)
+    errors = []
+    for order in [2, 4, 6, None]:
+        eig_vals, eig_vecs = dispersive.eigenstates(cavity_array, order)
+        errors.append(np.max(np.abs(np.sort_complex(eig_vals) - exact)))
+        assert np.allclose(dispersive.residuals(cavity_array, eig_vals, eig_vecs), 0, atol=2 * errors[-1] + 1e-12)
+    assert errors[0] < 0.05 and errors[1] < errors[0] / 10 and errors[2] < errors[1] / 10
+    assert errors[3] < 1e-12
+
+    H = cavity_array.hamiltonian_matrix().toarray()
+    vecs = dispersive.lift(cavity_array, eig_vals, eig_vecs)
+    assert np.max(np.abs(H @ vecs - vecs * eig_vals)) < 1e-12
+
+def test_no_emitters():
+    """Without emitters the effective model is the photon hamiltonian"""
+    model_params = {'emitters_per_cavity': 0, 'kappa': 0.1, 'hopping': 0.5, 'gamma': 0.05, 'g': 0.3,
+                    'cavity_freqs': [0.0, 0.3, -0.1], 'emitter_freqs': 5.0}
+    cavity_array = multi_cavity.CavityArray(3, 1, model_params)
+    eig_vals, _ = dispersive.eigenstates(cavity_array, None)
+    assert np.allclose(eig_vals, np.sort_complex(np.linalg.eigvals(cavity_array.hamiltonian_matrix().toarray())))
+
+@pytest.mark.parametrize('order', [0, 1, 3, 5])
+def test_invalid_order(order):
+    with pytest.raises(AssertionError):
+        dispersive.eigenstates(detuned_array(2), order)
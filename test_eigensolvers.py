@@ -0,0 +1,56 @@
+"""Checks of the residual of every eigensolver path of CavityArray.eigenstates"""
+
+import numpy as np
+import pytest
+
+import multi_cavity
+from util import residuals
+
+
+def make_array(num_cavities, num_photons, loss='uniform', uniform=False, **kwargs):
+    """Chain with 2 emitters per cavity; loss is 'none', 'uniform' or 'random'"""
+    rng = np.random.default_rng(num_cavities)
+    kappa, gamma = {'none': (0, 0), 'uniform': (0.1, 0.1),
+                    'random': (rng.uniform(0, 0.2, num_cavities).tolist(), rng.uniform(0, 0.2, (num_cavities, 2)).tolist())}[loss]
+    model_params = {'emitters_per_cavity': 2, 'kappa': kappa, 'hopping': 1.0, 'gamma': gamma, 'g': 0.3,
+                    'cavity_freqs': 0.0 if uniform else rng.normal(0, 0.3, num_cavities).tolist(),
+                    'emitter_freqs': 0.2 if uniform else rng.normal(0.2, 0.3, (num_cavities, 2)).tolist()}
+    return multi_cavity.CavityArray(num_cavities, num_photons, model_params, **kwargs)
+
+def check_eigenstates(cavity_array, tol=1e-12):
+    eig_vals, eig_vecs = cavity_array.eigenstates()
+    H = cavity_array.hamiltonian_matrix(np.complex128)
+    assert eig_vecs.shape == H.shape
+    assert np.max(residuals(H, eig_vals, eig_vecs)) < tol
+    assert np.all(np.diff(np.real(eig_vals)) >= 0)
+    assert np.allclose(np.linalg.norm(eig_vecs, axis=0), 1, atol=100 * tol)
+    assert np.allclose(np.sort_complex(eig_vals), np.sort_complex(np.linalg.eigvals(H.toarray())), atol=1e3 * tol)
+
+
+@pytest.mark.parametrize('solver, args, kwargs', [('analytic', (6, 1), {'uniform': True}),
+                                                  ('analytic', (6, 1), {'uniform': True, 'periodic': True}),
+                                                  ('eig_banded', (40, 1), {}),
+                                                  ('eig_banded', (40, 1), {'loss': 'none'}),
+                                                  ('eig_banded', (9, 2), {'reorder': True}),
+                                                  ('eigh', (3, 1), {'loss': 'none'}),
+                                                  ('eigh', (3, 2), {'loss': 'none'}),
+                                                  ('eigh-shifted', (3, 1), {}),
+                                                  ('eigh-shifted', (3, 2), {'uniform': True}),
+                                                  ('eig', (3, 1), {'loss': 'random'}),
+                                                  ('eig', (40, 1), {'loss': 'random'}),
+                                                  ('eig', (3, 2), {'loss': 'random'})])
+@pytest.mark.parametrize('precision', ['double', 'single'])
+def test_solver(solver, args, kwargs, precision):
+    cavity_array = make_array(*args, precision=precision, **kwargs)
+    check_eigenstates(cavity_array, 1e-12 if precision == 'double' else 1e-5)
+    assert cavity_array.solver == solver
+
+@pytest.mark.parametrize('args, kwargs', [((40, 1), {}), ((3, 1), {'loss': 'none'}), ((3, 2), {})])
+def test_update(args, kwargs):
+    cavity_array = make_array(*args, **kwargs)
+    cavity_array.eigenstates()
+    max_rank = len(cavity_array.states)
+    cavity_array.tune('cavity_freqs', 1, 0.45, max_rank)
+    cavity_array.tune('emitter_freqs', (2, 1), -0.1, max_rank)
+    assert cavity_array.solver == 'update'
+    check_eigenstates(cavity_array, 1e-11)
@@ -0,0 +1,55 @@
+"""Checks of the block sparse Lindblad solver against qutip.mesolve"""
+
+import numpy as np
+import qutip
+import pytest
+
+import master_equation
+import multi_cavity_qutip
+import states_qutip
+
+TIMES = np.linspace(0, 5, 11)
+
+
+def lossy_params(emitters_per_cavity, seed=0):
+    rng = np.random.default_rng(seed)
+    num_cavities = len(emitters_per_cavity)
+    return {'emitters_per_cavity': emitters_per_cavity, 'kappa': rng.uniform(0.1, 0.4, num_cavities).tolist(),
+            'hopping': 0.6, 'gamma': [rng.uniform(0.05, 0.3, n).tolist() for n in emitters_per_cavity],
+            'g': [rng.uniform(0.2, 0.5, n).tolist() for n in emitters_per_cavity],
+            'cavity_freqs': rng.normal(0, 0.3, num_cavities).tolist(),
+            'emitter_freqs': [rng.normal(0, 0.3, n).tolist() for n in emitters_per_cavity]}
+
+def qutip_numbers(model_params, num_photons, psi0, periodic=False):
+    """Photon and emitter excitation numbers of each cavity from qutip.mesolve of the full
+    hamiltonian with kappa and gamma collapse operators"""
+    reference = multi_cavity_qutip.CavityArray(len(model_params['emitters_per_cavity']), num_photons, model_params, periodic)
+    c_ops, photon_ops, excite_ops = [], [], []
+    for i, cavity in enumerate(reference):
+        a = reference.a(i)
+        c_ops.append(np.sqrt(cavity.kappa) * a)
+        photon_ops.append(a.dag() * a)
+        excite = 0
+        for j in range(cavity.num_emitters):
+            s = reference.sigma(i, j)
+            c_ops.append(np.sqrt(cavity.gamma[j]) * s)
+            excite += s.dag() * s
+        excite_ops.append(excite if cavity.num_emitters else 0 * a)
+    options = qutip.Options(atol=1e-12, rtol=1e-10)
+    result = qutip.mesolve(reference.hamiltonian(), states_qutip.tovec(reference, psi0), TIMES, c_ops,
+                           photon_ops + excite_ops, options=options)
+    expect = np.array(result.expect).T
+    return expect[:, :len(reference)], expect[:, len(reference):]
+
+
+@pytest.mark.parametrize('emitters_per_cavity, psi0, periodic', [([1, 1], [(0, -1), (1, 0)], False),
+                                                                 ([1, 0, 1], [(0, -1), (0, -1)], False),
+                                                                 ([0, 1, 1], [(1, 0), (2, -1)], True)])
+def test_qutip_mesolve(emitters_per_cavity, psi0, periodic):
+    model_params = lossy_params(emitters_per_cavity)
+    result = master_equation.mesolve(len(emitters_per_cavity), 2, model_params, psi0, TIMES, periodic)
+    photon, excite = qutip_numbers(model_params, 2, psi0, periodic)
+    assert np.max(np.abs(result['photon'] - photon)) < 1e-8
+    assert np.max(np.abs(result['excite'] - excite)) < 1e-8
+    #the excitations decay
+    assert np.all(np.diff(np.sum(result['photon'] + result['excite'], axis=1)) < 0)
@@ -0,0 +1,64 @@
+"""Checks of the participation metrics on basis states and against explicit sums"""
+
+import numpy as np
+import pytest
+
+import metrics
+import multi_cavity
+
+
+def uncoupled_array(num_photons, storage='dense'):
+    """No hopping or coupling; the eigenstates are the basis states"""
+    model_params = {'emitters_per_cavity': [2, 1], 'kappa': 0.1, 'hopping': 0.0, 'gamma': 0.1, 'g': 0.0,
+                    'cavity_freqs': [0.0, 1.3], 'emitter_freqs': [[0.17, 0.71], [3.1]]}
+    return multi_cavity.CavityArray(2, num_photons, model_params, storage=storage)
+
+def coupled_array(num_photons, storage='dense'):
+    rng = np.random.default_rng(num_photons)
+    model_params = {'emitters_per_cavity': [2, 1, 1], 'kappa': rng.uniform(0, 0.2, 3).tolist(), 'hopping': 0.8,
+                    'gamma': 0.05, 'g': 0.4, 'cavity_freqs': rng.normal(size=3).tolist(), 'emitter_freqs': 0.1}
+    return multi_cavity.CavityArray(3, num_photons, model_params, storage=storage, storage_tol=1e-12, storage_k=1000)
+
+def basis_states(cavity_array):
+    """Basis state of each eigenstate"""
+    _, eig_vecs = cavity_array.eigenstates()
+    return [sorted(cavity_array.states[int(k)]) for k in np.argmax(np.abs(eig_vecs), axis=0)]
+
+
+@pytest.mark.parametrize('state, node, polariton', [([(0, -1), (1, -1)], 2, 1),
+                                                    ([(0, -1), (0, -1)], 1, 1),
+                                                    ([(0, -1), (0, 0)], 1, 2),
+                                                    ([(0, 0), (1, 0)], 2, 1),
+                                                    ([(0, 0), (0, 1)], 1, 1),
+                                                    ([(1, -1), (0, 1)], 2, 2)])
+def test_two_photon_basis_states(state, node, polariton):
+    """Each quantum carries half the weight of a two photon basis state"""
+    cavity_array = uncoupled_array(2)
+    k = basis_states(cavity_array).index(sorted(state))
+    assert np.isclose(metrics.node_participation(cavity_array)[k], node)
+    assert np.isclose(metrics.polariton_participation(cavity_array)[k], polariton)
+    assert np.isclose(metrics.node_participation(cavity_array, normalize=True)[k], node - 1)
+    assert np.isclose(metrics.polariton_participation(cavity_array, normalize=True)[k], polariton - 1)
+
+def test_single_photon_basis_states():
+    cavity_array = uncoupled_array(1)
+    assert np.allclose(metrics.node_participation(cavity_array), 1)
+    assert np.allclose(metrics.polariton_participation(cavity_array), 1)
+
+@pytest.mark.parametrize('num_photons', [1, 2, 3])
+@pytest.mark.parametrize('storage', ['dense', 'prob', 'sparse', 'topk'])
+def test_explicit_sums(num_photons, storage):
+    """w_i is the sum over basis states of |v_k|^2 times the fraction of the quanta of
+    state k in cavity i, or that are photons for the polariton participation"""
+    cavity_array = coupled_array(num_photons, storage)
+    _, eig_vecs = coupled_array(num_photons).eigenstates()
+    P = np.abs(eig_vecs)**2
+    node = np.zeros((3, P.shape[1]))
+    photon = np.zeros((2, P.shape[1]))
+    for k, state in enumerate(cavity_array.states):
+        for loc in state:
+            node[loc[0]] += P[k] / num_photons
+            photon[0 if loc[1] == -1 else 1] += P[k] / num_photons
+    tol = 1e-5 if storage == 'prob' else 1e-9
+    assert np.allclose(metrics.node_participation(cavity_array), 1 / np.sum(node**2, axis=0), rtol=tol)
+    assert np.allclose(metrics.polariton_participation(cavity_array), 1 / np.sum(photon**2, axis=0), rtol=tol)
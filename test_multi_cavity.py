@@ -0,0 +1,95 @@
+"""Checks of the single precision eigenstates and their double precision fallback"""
+
+import numpy as np
+import pytest
+
+import multi_cavity
+import multi_cavity_qutip
+import states_qutip
+
+
+def disordered_array(num_cavities, num_photons, seed=0, **kwargs):
+    rng = np.random.default_rng(seed)
+    model_params = {'emitters_per_cavity': 2, 'kappa': rng.uniform(0, 0.2, num_cavities).tolist(),
+                    'hopping': rng.uniform(0.5, 1.5, num_cavities - 1).tolist(), 'gamma': 0.05,
+                    'g': rng.uniform(0.1, 0.5, (num_cavities, 2)).tolist(),
+                    'cavity_freqs': rng.normal(size=num_cavities).tolist(),
+                    'emitter_freqs': rng.normal(size=(num_cavities, 2)).tolist()}
+    return multi_cavity.CavityArray(num_cavities, num_photons, model_params, **kwargs)
+
+def uniform_loss_array(num_cavities, num_photons, **kwargs):
+    rng = np.random.default_rng(1)
+    model_params = {'emitters_per_cavity': 2, 'kappa': 0.1, 'hopping': 1.0, 'gamma': 0.1, 'g': 0.3,
+                    'cavity_freqs': (rng.normal(size=num_cavities) / 3).tolist(),
+                    'emitter_freqs': (rng.normal(size=(num_cavities, 2)) / 3).tolist()}
+    return multi_cavity.CavityArray(num_cavities, num_photons, model_params, **kwargs)
+
+
+@pytest.mark.parametrize('make', [disordered_array, uniform_loss_array])
+@pytest.mark.parametrize('num_cavities, num_photons', [(6, 1), (3, 2)])
+def test_single_precision(make, num_cavities, num_photons):
+    cavity_array = make(num_cavities, num_photons, precision='single')
+    eig_vals, eig_vecs = cavity_array.eigenstates()
+    assert eig_vals.dtype == np.complex64 and eig_vecs.dtype == np.complex64
+    assert cavity_array.hamiltonian_matrix().dtype == np.complex64
+    H = cavity_array.hamiltonian_matrix(np.complex128).toarray()
+    assert np.max(np.abs(np.sort_complex(eig_vals) - np.sort_complex(np.linalg.eigvals(H)))) < 1e-4
+
+@pytest.mark.parametrize('make', [disordered_array, uniform_loss_array])
+@pytest.mark.parametrize('num_cavities, num_photons', [(6, 1), (3, 2)])
+def test_residual_fallback(make, num_cavities, num_photons):
+    """A failed residual check recomputes the eigenstates from the double precision hamiltonian,
+    matching a double precision array to roundoff"""
+    fallback = make(num_cavities, num_photons, precision='single', residual_tol=1e-12)
+    double = make(num_cavities, num_photons)
+    eig_vals, eig_vecs = fallback.eigenstates()
+    assert eig_vals.dtype == np.complex128
+    assert np.max(np.abs(eig_vals - double.eigenstates()[0])) < 1e-12
+    assert fallback.solver == double.solver
+    H = double.hamiltonian_matrix().toarray()
+    assert np.max(np.abs(H @ eig_vecs - eig_vecs * eig_vals)) < 1e-12
+
+@pytest.mark.parametrize('num_photons', [1, 2])
+@pytest.mark.parametrize('emitters_per_cavity', [2, [0, 2, 1, 3]])
+def test_model_params_lists(num_photons, emitters_per_cavity):
+    """The model params are lists, one list per cavity for the emitter params, whatever the
+    input type and number of photons, and are not shared with the input"""
+    num_emitters = emitters_per_cavity if isinstance(emitters_per_cavity, list) else [emitters_per_cavity] * 4
+    g = [np.full(n, 0.3) for n in num_emitters]
+    model_params = {'emitters_per_cavity': emitters_per_cavity, 'kappa': np.full(4, 0.1), 'hopping': 1.0, 'gamma': 0.05,
+                    'g': g, 'cavity_freqs': [0.0, 0.1, 0.2, 0.3], 'emitter_freqs': 0.2}
+    cavity_array = multi_cavity.CavityArray(4, num_photons, model_params)
+    for key, vals in cavity_array.model_params.items():
+        assert type(vals) is list
+    for key in ['g', 'gamma', 'emitter_freqs']:
+        assert [len(vals) for vals in cavity_array.model_params[key]] == num_emitters
+        assert all(type(vals) is list for vals in cavity_array.model_params[key])
+    assert cavity_array.model_params['kappa'] == [0.1] * 4
+    cavity_array.model_params['cavity_freqs'][0] = 1.0
+    assert model_params['cavity_freqs'][0] == 0.0
+
+@pytest.mark.parametrize('key, index', [('cavity_freqs', 1), ('kappa', 2), ('hopping', 0), ('g', (3, 0)), ('gamma', (0, 1))])
+def test_tune_hamiltonian(key, index):
+    """The single photon hamiltonian is rebuilt from the tuned model params"""
+    cavity_array = uniform_loss_array(4, 1)
+    cavity_array.hamiltonian_matrix()
+    cavity_array.tune(key, index, 0.7)
+    fresh = multi_cavity.CavityArray(4, 1, cavity_array.model_params)
+    assert np.allclose(cavity_array.hamiltonian_matrix().toarray(), fresh.hamiltonian_matrix().toarray())
+
+@pytest.mark.parametrize('num_photons, emitters_per_cavity', [(2, [1]), (2, [1, 2]), (3, [1, 2]), (2, [1, 0, 1])])
+def test_qutip_reference(num_photons, emitters_per_cavity):
+    """The lossless hamiltonian matches the full qutip hamiltonian projected on the
+    num_photons excitation states; the cavity-emitter elements carry the sqrt(n+1)
+    photon factor"""
+    num_cavities = len(emitters_per_cavity)
+    rng = np.random.default_rng(num_photons)
+    model_params = {'emitters_per_cavity': emitters_per_cavity, 'kappa': 0, 'hopping': 0.7, 'gamma': 0,
+                    'g': [rng.uniform(0.1, 0.5, n).tolist() for n in emitters_per_cavity],
+                    'cavity_freqs': rng.normal(size=num_cavities).tolist(),
+                    'emitter_freqs': [rng.normal(size=n).tolist() for n in emitters_per_cavity]}
+    cavity_array = multi_cavity.CavityArray(num_cavities, num_photons, model_params)
+    reference = multi_cavity_qutip.CavityArray(num_cavities, num_photons, model_params)
+    P = np.hstack([states_qutip.tovec(reference, state).full() for state in cavity_array.states])
+    H = P.conj().T @ reference.hamiltonian().full() @ P
+    assert np.allclose(cavity_array.hamiltonian_matrix().toarray(), H, atol=1e-12)
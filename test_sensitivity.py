@@ -0,0 +1,78 @@
+"""Checks of the analytic eigenvalue and eigenvector derivatives against dense solves"""
+
+import numpy as np
+import scipy.optimize
+import pytest
+
+import multi_cavity
+import sensitivity
+
+#forward difference step
+EPS = 1e-7
+
+
+def disordered_array(num_cavities, num_photons, seed=0):
+    rng = np.random.default_rng(seed)
+    model_params = {'emitters_per_cavity': 2, 'kappa': rng.uniform(0, 0.2, num_cavities).tolist(),
+                    'hopping': rng.uniform(0.5, 1.5, num_cavities - 1).tolist(), 'gamma': 0.05,
+                    'g': rng.uniform(0.1, 0.5, (num_cavities, 2)).tolist(),
+                    'cavity_freqs': rng.normal(size=num_cavities).tolist(),
+                    'emitter_freqs': rng.normal(size=(num_cavities, 2)).tolist()}
+    return multi_cavity.CavityArray(num_cavities, num_photons, model_params)
+
+def identical_array(num_cavities, num_photons):
+    """Identical emitters give degenerate dark states"""
+    model_params = {'emitters_per_cavity': 3, 'kappa': 0.1, 'hopping': 1.0, 'gamma': 0.1, 'g': 0.3,
+                    'cavity_freqs': 0.0, 'emitter_freqs': 0.2}
+    return multi_cavity.CavityArray(num_cavities, num_photons, model_params)
+
+def eig(H):
+    eig_vals, eig_vecs = np.linalg.eig(H)
+    order = np.argsort(np.real(eig_vals), kind='stable')
+    return eig_vals[order], eig_vecs[:, order]
+
+
+@pytest.mark.parametrize('num_cavities, num_photons', [(1, 1), (3, 1), (5, 1), (2, 2), (3, 2)])
+def test_structure_matrices(num_cavities, num_photons):
+    cavity_array = disordered_array(num_cavities, num_photons)
+    labels, matrices = sensitivity.structure_matrices(cavity_array)
+    H = sensitivity.assemble(matrices, sensitivity.parameters(cavity_array, labels))
+    assert np.allclose(H.toarray(), cavity_array.hamiltonian_matrix().toarray(), atol=1e-14)
+
+@pytest.mark.parametrize('num_cavities, num_photons', [(1, 1), (3, 1), (5, 1), (2, 2), (3, 2)])
+@pytest.mark.parametrize('make', [disordered_array, identical_array])
+def test_jacobian(num_cavities, num_photons, make):
+    """Eigenvalue derivatives match forward differences of a dense solve; in degenerate
+    levels the derivatives are the slopes of the split levels"""
+    cavity_array = make(num_cavities, num_photons)
+    labels, matrices = sensitivity.structure_matrices(cavity_array)
+    H = sensitivity.assemble(matrices, sensitivity.parameters(cavity_array, labels)).toarray()
+    eig_vals, eig_vecs = eig(H)
+    J, dV = sensitivity.jacobian(eig_vals, eig_vecs, matrices, vectors=True)
+    assert J.shape == (len(eig_vals), len(labels))
+
+    clusters = sensitivity.degenerate_clusters(eig_vals)
+    for p, M in enumerate(matrices):
+        fd = (eig(H + EPS * M.toarray())[0] - eig_vals) / EPS
+        #levels split only in the imaginary part have no order within a cluster
+        for cluster in clusters:
+            rows, cols = scipy.optimize.linear_sum_assignment(np.abs(J[cluster, p][:, None] - fd[cluster][None, :]))
+            fd[np.array(cluster)[rows]] = fd[np.array(cluster)[cols]]
+        assert np.max(np.abs(J[:, p] - fd)) < 1e-5
+
+    #first order eigen equation H dv + M v = E dv + dE v for the nondegenerate levels
+    degenerate = [k for cluster in clusters for k in cluster]
+    nondegenerate = np.setdiff1d(np.arange(len(eig_vals)), degenerate)
+    assert np.all(np.isnan(dV[:, :, degenerate]))
+    for p, M in enumerate(matrices):
+        V, dv = eig_vecs[:, nondegenerate], dV[p][:, nondegenerate]
+        residual = H @ dv + M @ V - dv * eig_vals[nondegenerate] - V * J[nondegenerate, p]
+        assert np.max(np.abs(residual), initial=0) < 1e-9
+
+def test_eigenvalue_jacobian():
+    cavity_array = disordered_array(4, 1)
+    labels, J = sensitivity.eigenvalue_jacobian(cavity_array)
+    assert labels == sensitivity.parameter_labels(cavity_array)
+    eig_vals, eig_vecs = cavity_array.eigenstates()
+    _, matrices = sensitivity.structure_matrices(cavity_array)
+    assert np.allclose(J, sensitivity.jacobian(eig_vals, eig_vecs, matrices))
@@ -0,0 +1,72 @@
+"""Checks of the published basis tables attached in this process and in workers"""
+
+import numpy as np
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import multi_cavity
+import shared
+
+MODEL_PARAMS = {'emitters_per_cavity': [1, 2, 0], 'kappa': 0.1, 'hopping': 1.0, 'gamma': 0.05, 'g': 0.5,
+                'cavity_freqs': [0.0, 0.2, -0.1], 'emitter_freqs': 0.2}
+
+
+def check_view(view, cavity_array):
+    """Compares a BasisView with the basis and hamiltonian of cavity_array"""
+    assert len(view) == len(cavity_array.states)
+    for i, state in enumerate(cavity_array.states):
+        assert sorted(view[i]) == sorted(state)
+        assert state in view
+        assert view.index(state) == i
+        assert view.index(list(reversed(state))) == i
+    assert np.array_equal(view.tovec(cavity_array.states[-1]), cavity_array.states.tovec(cavity_array.states[-1]))
+    photon, excite = metrics.cavity_numbers(cavity_array)
+    assert np.array_equal(view.photon, photon) and np.array_equal(view.excite, excite)
+    assert (view.hamiltonian() != cavity_array.hamiltonian_matrix()).nnz == 0
+    assert not view.data.flags.writeable
+
+def check_lookup(view, num_photons):
+    """States with an unknown loc or another number of quanta are not in the basis"""
+    for state in [[(0, 5)] * num_photons, [(7, -1)] * num_photons, [(0, -1)] * (num_photons + 1), []]:
+        assert state not in view
+        with pytest.raises(KeyError):
+            view.index(state)
+
+def _work(handle):
+    view = shared.attach(handle)
+    result = [view.index(view[i]) for i in range(len(view))], view.hamiltonian().toarray()
+    view.close()
+    return result
+
+
+@pytest.mark.parametrize('num_photons', [1, 2, 3])
+def test_shared_memory(num_photons):
+    cavity_array = multi_cavity.CavityArray(3, num_photons, MODEL_PARAMS)
+    with shared.publish(cavity_array) as handle:
+        assert handle.meta['emitters_per_cavity'] == [1, 2, 0]
+        view = shared.attach(handle)
+        check_view(view, cavity_array)
+        check_lookup(view, num_photons)
+        view.close()
+
+@pytest.mark.parametrize('num_photons', [1, 2])
+def test_npy_files(num_photons, tmp_path):
+    cavity_array = multi_cavity.CavityArray(3, num_photons, MODEL_PARAMS)
+    handle = shared.publish(cavity_array, str(tmp_path))
+    view = shared.attach(handle)
+    check_view(view, cavity_array)
+    check_lookup(view, num_photons)
+    del view
+    handle.unlink()
+    assert not list(tmp_path.iterdir())
+
+def test_workers():
+    """Worker processes attach to the owner's shared memory blocks"""
+    cavity_array = multi_cavity.CavityArray(3, 2, MODEL_PARAMS)
+    with shared.publish(cavity_array) as handle:
+        with ProcessPoolExecutor(2) as pool:
+            results = list(pool.map(_work, [handle, handle]))
+    for index, H in results:
+        assert index == list(range(len(cavity_array.states)))
+        assert np.array_equal(H, cavity_array.hamiltonian_matrix().toarray())
@@ -0,0 +1,53 @@
+"""Checks of the analytic identical cavity eigenstates against dense solves"""
+
+import numpy as np
+import scipy.optimize
+import pytest
+
+import multi_cavity
+import solutions
+
+
+def identical_array(num_cavities, emitters_per_cavity, periodic=False, g=0.3, kappa=0.1, gamma=0.05, emitter_freq=0.2):
+    model_params = {'emitters_per_cavity': emitters_per_cavity, 'kappa': kappa, 'hopping': 1.0, 'gamma': gamma,
+                    'g': g, 'cavity_freqs': 0.0, 'emitter_freqs': emitter_freq}
+    return multi_cavity.CavityArray(num_cavities, 1, model_params, periodic)
+
+def check_eigenstates(cavity_array, tol=1e-10):
+    """Compares the analytic eigenstates with numpy.linalg.eig of the hamiltonian"""
+    eig_vals, eig_vecs = solutions.identical_cavities_eigenstates(cavity_array)
+    H = cavity_array.hamiltonian_matrix().toarray()
+    assert eig_vecs.shape == H.shape
+    #match the eigenvalues one to one, degenerate levels included
+    dense = np.linalg.eigvals(H)
+    rows, cols = scipy.optimize.linear_sum_assignment(np.abs(eig_vals[:, None] - dense[None, :]))
+    assert np.max(np.abs(eig_vals[rows] - dense[cols])) < tol
+    assert np.all(np.diff(np.real(eig_vals)) >= -tol)
+    assert np.max(np.abs(H @ eig_vecs - eig_vecs * eig_vals)) < tol
+    assert np.allclose(np.linalg.norm(eig_vecs, axis=0), 1)
+    #degenerate eigenvectors span their eigenspace
+    assert np.linalg.matrix_rank(eig_vecs, tol=1e-8) == len(eig_vals)
+
+
+@pytest.mark.parametrize('num_cavities', [1, 2, 3, 6])
+@pytest.mark.parametrize('emitters_per_cavity', [0, 1, 3])
+@pytest.mark.parametrize('periodic', [False, True])
+def test_identical_cavities_eigenstates(num_cavities, emitters_per_cavity, periodic):
+    check_eigenstates(identical_array(num_cavities, emitters_per_cavity, periodic))
+
+@pytest.mark.parametrize('num_cavities', [2, 5])
+def test_lossless(num_cavities):
+    check_eigenstates(identical_array(num_cavities, 2, kappa=0, gamma=0))
+
+@pytest.mark.parametrize('periodic', [False, True])
+def test_uncoupled_resonant(periodic):
+    """g = 0 with resonant emitters; photon modes and emitters are degenerate"""
+    check_eigenstates(identical_array(4, 2, periodic, g=0, kappa=0, gamma=0, emitter_freq=0.0))
+
+def test_dispatch():
+    """Uniform single photon arrays use the analytic solution"""
+    cavity_array = identical_array(5, 2, True)
+    eig_vals, _ = cavity_array.eigenstates()
+    assert cavity_array.solver == 'analytic'
+    dense, _ = cavity_array._solve(np.complex128)
+    assert np.allclose(np.real(eig_vals), np.sort(np.real(dense)), atol=1e-10)
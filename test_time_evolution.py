@@ -0,0 +1,32 @@
+"""Checks of the time evolution operators"""
+
+import numpy as np
+import scipy.linalg
+import pytest
+
+import time_evolution
+
+
+@pytest.mark.parametrize('dtype, expected', [(float, np.complex128), (int, np.complex128),
+                                             (np.complex128, np.complex128), (np.complex64, np.complex64)])
+def test_expandbasis_dtype(dtype, expected):
+    """The expanded matrix is complex, in the precision of the input"""
+    a = np.arange(9).reshape(3, 3).astype(dtype)
+    a_expanded = time_evolution.expandbasis(a)
+    assert a_expanded.dtype == expected
+    assert a_expanded.shape == (8, 8)
+    for i in range(3):
+        for j in range(3):
+            assert a_expanded[1 << (2 - i), 1 << (2 - j)] == a[i, j]
+    assert a_expanded[0, 0] == 1 and a_expanded[7, 7] == 1
+
+@pytest.mark.parametrize('kind', ['hermitian', 'shifted', 'general'])
+def test_timeop(kind):
+    rng = np.random.default_rng(0)
+    A = rng.normal(size=(5, 5)) + 1j * rng.normal(size=(5, 5))
+    H = (A + A.conj().T) / 2
+    if kind == 'shifted':
+        H = H - 0.05j * np.eye(5)
+    elif kind == 'general':
+        H = H - 0.5j * np.diag(rng.uniform(0, 0.2, 5))
+    assert np.allclose(time_evolution.timeop(H, 0.7, kind), scipy.linalg.expm(-0.7j * H), atol=1e-10)
@@ -0,0 +1,41 @@
+"""Checks of the edge list and adjacency matrix inputs of the cavity array graph"""
+
+import numpy as np
+import scipy.sparse as sp
+import pytest
+
+import multi_cavity
+import topology
+
+
+@pytest.mark.parametrize('edges', [[(0, 1, 0.5), (1, 2, 1.0), (2, 0, 1.5)],
+                                   np.array([[0, 1, 0.5], [1, 2, 1.0], [2, 0, 1.5]])])
+def test_ring_triples(edges):
+    """A (3, 3) array of triples of a 3 cavity ring is an edge list, not an adjacency matrix"""
+    assert topology.parse_edges(edges, 3) == ([(0, 1), (1, 2), (2, 0)], [0.5, 1.0, 1.5])
+
+@pytest.mark.parametrize('edges', [[(0, 1), (1, 0)], np.array([[0, 1], [1, 0]])])
+def test_pairs(edges):
+    """A (2, 2) array of pairs of a 2 cavity array is an edge list, not an adjacency matrix"""
+    assert topology.parse_edges(edges, 2) == ([(0, 1), (1, 0)], None)
+
+@pytest.mark.parametrize('fmt', ['csr', 'coo', 'lil'])
+def test_sparse_adjacency(fmt):
+    """Only the upper triangle of a sparse adjacency matrix is read"""
+    A = sp.csr_matrix(np.array([[0, 0.5, 1.5], [0.5, 0, 1.0], [1.5, 1.0, 0]])).asformat(fmt)
+    assert topology.parse_edges(A, 3) == ([(0, 1), (0, 2), (1, 2)], [0.5, 1.5, 1.0])
+
+@pytest.mark.parametrize('edges, num_cavities', [(np.zeros((3, 4)), 3), (np.zeros(3), 3), (sp.csr_matrix((2, 2)), 3),
+                                                 ([(0, 3)], 3), ([(1, 1)], 3)])
+def test_invalid(edges, num_cavities):
+    with pytest.raises(AssertionError):
+        topology.parse_edges(edges, num_cavities)
+
+def test_cavity_array_edges():
+    """Edge lists and the matching sparse adjacency matrix give the same hamiltonian"""
+    model_params = {'emitters_per_cavity': 1, 'kappa': 0.1, 'hopping': None, 'gamma': 0.05, 'g': 0.3,
+                    'cavity_freqs': [0.0, 0.2, -0.1], 'emitter_freqs': 0.1}
+    triples = np.array([[0, 1, 0.5], [1, 2, 1.0], [2, 0, 1.5]])
+    H = [multi_cavity.CavityArray(3, 2, model_params, edges=edges).hamiltonian_matrix().toarray()
+         for edges in [triples, triples.tolist(), topology.adjacency(3, [(0, 1), (1, 2), (2, 0)], [0.5, 1.0, 1.5])]]
+    assert np.allclose(H[0], H[1]) and np.allclose(H[0], H[2])
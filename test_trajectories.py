@@ -0,0 +1,31 @@
+"""Checks of the Monte Carlo trajectory averages against the master equation"""
+
+import numpy as np
+import pytest
+
+import master_equation
+import trajectories
+
+MODEL_PARAMS = {'emitters_per_cavity': [1, 2], 'kappa': [0.4, 0.2], 'hopping': 0.6, 'gamma': [[0.1], [0.3, 0.05]],
+                'g': [[0.5], [0.3, 0.4]], 'cavity_freqs': [0.0, 0.3], 'emitter_freqs': [[0.1], [-0.2, 0.2]]}
+TIMES = np.linspace(0, 4, 9)
+
+
+@pytest.mark.parametrize('num_photons, psi0', [(1, [(0, -1)]), (2, [(0, -1), (1, 0)])])
+def test_mcsolve(num_photons, psi0):
+    """Trajectory averages agree with mesolve within 5 standard errors; the decay jumps
+    between excitation sectors are exercised for 2 photons"""
+    mc = trajectories.mcsolve(2, num_photons, MODEL_PARAMS, psi0, TIMES, ntraj=2000, processes=1, chunksize=500, seed=1)
+    me = master_equation.mesolve(2, num_photons, MODEL_PARAMS, psi0, TIMES)
+    for key in ['photon', 'excite']:
+        assert mc[key].shape == me[key].shape == (len(TIMES), 2)
+        assert np.all(np.abs(mc[key] - me[key]) <= 5 * mc[key + '_err'] + 1e-3)
+    assert np.allclose(np.sum(mc['photon'][0] + mc['excite'][0]), num_photons)
+
+def test_seed():
+    """Results depend on the seed only, not on the number of processes"""
+    args = (2, 2, MODEL_PARAMS, [(0, -1), (1, 1)], TIMES)
+    serial = trajectories.mcsolve(*args, ntraj=60, processes=1, chunksize=25, seed=3)
+    pooled = trajectories.mcsolve(*args, ntraj=60, processes=2, chunksize=25, seed=3)
+    for key in ['photon', 'excite', 'photon_err', 'excite_err']:
+        assert np.allclose(serial[key], pooled[key])
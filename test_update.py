@@ -0,0 +1,101 @@
+"""Checks of the low-rank eigenstate updates against dense hermitian solves"""
+
+import numpy as np
+import scipy.linalg
+import pytest
+
+import multi_cavity
+import update
+
+SIZES = [1, 2, 5, 40]
+
+
+def random_hermitian(n, rng):
+    A = rng.normal(size=(n, n)) + 1j * rng.normal(size=(n, n))
+    return (A + A.conj().T) / 2
+
+def degenerate_hermitian(n, rng):
+    """Hermitian matrix with triply degenerate eigenvalues"""
+    d = np.repeat(rng.normal(size=(n + 2) // 3), 3)[:n]
+    Q = np.linalg.qr(rng.normal(size=(n, n)) + 1j * rng.normal(size=(n, n)))[0]
+    return (Q * d) @ Q.conj().T
+
+def check_eigenstates(H, eig_vals, eig_vecs, tol=1e-10):
+    """Compares eigenstates with a dense solve of H"""
+    scale = max(np.linalg.norm(H), 1)
+    assert np.allclose(np.real(eig_vals), scipy.linalg.eigvalsh(H), atol=tol * scale)
+    assert np.max(np.abs(H @ eig_vecs - eig_vecs * np.real(eig_vals))) < tol * scale
+    assert np.allclose(eig_vecs.conj().T @ eig_vecs, np.eye(len(eig_vals)), atol=tol)
+
+
+@pytest.mark.parametrize('n', SIZES)
+@pytest.mark.parametrize('rho', [0.7, -2.5])
+def test_secular_roots(n, rho):
+    rng = np.random.default_rng(n)
+    d = np.sort(rng.normal(size=n)) + np.arange(n) * 1e-3
+    z = rng.normal(size=n)
+    roots, diffs = update.secular_roots(d, z**2, rho)
+    assert np.allclose(roots, np.linalg.eigvalsh(np.diag(d) + rho * np.outer(z, z)), atol=1e-12)
+    assert np.allclose(diffs, d[:, None] - roots[None, :], atol=1e-12)
+
+    U = update._secular_vectors(d, roots, diffs, z, rho)
+    check_eigenstates(np.diag(d) + rho * np.outer(z, z), roots, U)
+
+@pytest.mark.parametrize('n', SIZES)
+@pytest.mark.parametrize('make', [random_hermitian, degenerate_hermitian])
+def test_rank_one_update(n, make):
+    rng = np.random.default_rng(n)
+    H = make(n, rng)
+    eig_vals, eig_vecs = scipy.linalg.eigh(H)
+    for site, delta in [(0, 0.5), (n - 1, -3.0), (n // 2, 1e-8)]:
+        result = update.rank_one_update(eig_vals + 0j, eig_vecs, site, delta)
+        assert result is not None
+        H_new = H.copy()
+        H_new[site, site] += delta
+        check_eigenstates(H_new, *result)
+
+def test_rank_one_update_uniform_loss():
+    rng = np.random.default_rng(0)
+    H = random_hermitian(20, rng)
+    eig_vals, eig_vecs = scipy.linalg.eigh(H)
+    eig_vals, eig_vecs = update.rank_one_update(eig_vals - 0.05j, eig_vecs, 3, 0.4)
+    assert np.allclose(np.imag(eig_vals), -0.05)
+    H[3, 3] += 0.4
+    check_eigenstates(H, eig_vals, eig_vecs)
+
+def test_rank_one_update_general():
+    """Non-uniform loss is not hermitian; the caller falls back to a full solve"""
+    assert update.rank_one_update(np.array([0, 1 - 0.1j]), np.eye(2), 0, 0.5) is None
+
+@pytest.mark.parametrize('make', [random_hermitian, degenerate_hermitian])
+def test_diagonal_update(make):
+    rng = np.random.default_rng(1)
+    H = make(30, rng)
+    eig_vals, eig_vecs = scipy.linalg.eigh(H)
+    sites, deltas = [3, 10, 3, 29], [0.5, -1.0, 0.2, 2.0]
+    H_new = H.copy()
+    for site, delta in zip(sites, deltas):
+        H_new[site, site] += delta
+
+    vals, vecs = update.diagonal_update(eig_vals + 0j, eig_vecs, sites, deltas)
+    check_eigenstates(H_new, vals, vecs)
+    vals, vecs = update.diagonal_update(eig_vals + 0j, eig_vecs, sites, deltas, vectors=False)
+    assert vecs is None
+    assert np.allclose(np.real(vals), scipy.linalg.eigvalsh(H_new), atol=1e-10)
+
+@pytest.mark.parametrize('num_photons', [1, 2])
+def test_tune(num_photons):
+    """The low-rank update of tune, or its fallback, matches a full solve of the tuned array"""
+    model_params = {'emitters_per_cavity': 2, 'kappa': 0.1, 'hopping': 1.0, 'gamma': 0.1, 'g': 0.3,
+                    'cavity_freqs': [0.0, 0.4, -0.2, 0.1], 'emitter_freqs': 0.2}
+    cavity_array = multi_cavity.CavityArray(4, num_photons, model_params)
+    cavity_array.eigenstates()
+    cavity_array.tune('emitter_freqs', (1, 0), -0.3)
+    cavity_array.tune('cavity_freqs', 2, 0.5)
+    assert cavity_array.solver == 'update' or num_photons > 1
+    eig_vals, eig_vecs = cavity_array.eigenstates()
+
+    full = multi_cavity.CavityArray(4, num_photons, cavity_array.model_params)
+    assert np.allclose(eig_vals, full.eigenstates()[0], atol=1e-10)
+    H = full.hamiltonian_matrix().toarray()
+    assert np.max(np.abs(H @ eig_vecs - eig_vecs * eig_vals)) < 1e-10
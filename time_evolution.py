@@ -1,31 +1,76 @@
 import numpy as np
+import scipy.sparse as sp
 
-def expanded_timeop(hamiltonian: np.ndarray, t: float) -> np.ndarray:
+import eigensolvers
+
+def expanded_timeop(hamiltonian: np.ndarray, t: float, kind: str='general', dtype=None) -> np.ndarray:
     """
     Returns expaned time evolution operator
     """
     
-    return expandbasis(timeop(hamiltonian, t))
+    return expandbasis(timeop(hamiltonian, t, kind, dtype))
 
-def timeop(hamiltonian: np.ndarray, t: float) -> np.ndarray:
+def timeop(hamiltonian: np.ndarray, t: float, kind: str='general', dtype=None) -> np.ndarray:
     """time evolution operator
     
     Args:
         hamiltonian: hamiltonian of the cavity array in the cavity-emitter basis
         t: time
+        kind: 'hermitian', 'shifted' (hermitian minus a uniform imaginary loss) or 'general';
+            e.g. CavityArray.kind
+        dtype: optional complex dtype the hamiltonian is diagonalized in, e.g. CavityArray.dtype;
+            default is the dtype of the hamiltonian
     Returns the time evolution operator in the cavity-emitter basis
     """
     
-    eig_vals, eig_vecs = np.linalg.eig(hamiltonian)
+    eig_vals, eig_vecs, eig_inv = diagonalize(hamiltonian, kind, dtype)
     #time evolution operator in the diagonal basis
     U = np.exp(-1j*t*eig_vals)
-    U = np.diag(U)
     #change back to cavity-emitter basis
-    if np.allclose(hamiltonian, np.transpose(np.conj(hamiltonian))): #if H is hermitian
-        U = eig_vecs @ U @ eig_vecs.T
-    else: #must find inverse
-        U = eig_vecs @ U @ np.linalg.inv(eig_vecs)
-    return U
+    return (eig_vecs * U) @ eig_inv
+
+def diagonalize(hamiltonian: np.ndarray, kind: str='general', dtype=None):
+    """
+    Args:
+        hamiltonian: dense or sparse hamiltonian of the cavity array in the cavity-emitter basis
+        kind: 'hermitian', 'shifted' or 'general'
+        dtype: optional complex dtype the hamiltonian is diagonalized in
+    Returns the eigenvalues, eigenvectors and inverse of the eigenvector matrix; the
+    conjugate transpose for hermitian and shifted hamiltonians
+    """
+    
+    hamiltonian = hamiltonian.toarray() if sp.issparse(hamiltonian) else np.asarray(hamiltonian)
+    if dtype is not None:
+        hamiltonian = hamiltonian.astype(dtype)
+    if kind == 'general':
+        eig_vals, eig_vecs = np.linalg.eig(hamiltonian)
+        return eig_vals, eig_vecs, np.linalg.inv(eig_vecs)
+    
+    assert kind in ['hermitian', 'shifted'], "kind should be 'hermitian', 'shifted' or 'general', got '{}'".format(kind)
+    loss = -2 * np.mean(np.imag(np.diag(hamiltonian))) if kind == 'shifted' else 0
+    eig_vals, eig_vecs = eigensolvers.eigh_shifted(hamiltonian, loss, np.result_type(hamiltonian, np.complex64))
+    return eig_vals, eig_vecs, eig_vecs.conj().T
+
+def evolve(hamiltonian: np.ndarray, psi0: np.ndarray, times, kind: str='general', dtype=None):
+    """generator for the time evolved state
+    
+    The hamiltonian is diagonalized once; each yielded state costs a single
+    matrix-vector product so frames can be consumed lazily.
+    
+    Args:
+        hamiltonian: hamiltonian of the cavity array in the cavity-emitter basis
+        psi0: initial state vector in the cavity-emitter basis
+        times: iterable of times
+        kind: 'hermitian', 'shifted' or 'general'; see timeop
+        dtype: optional complex dtype the hamiltonian is diagonalized in; see timeop
+    Yields the state vector at each time in times
+    """
+    
+    eig_vals, eig_vecs, eig_inv = diagonalize(hamiltonian, kind, dtype)
+    #initial state in the diagonal basis
+    c = eig_inv @ np.asarray(psi0, dtype=eig_vecs.dtype).ravel()
+    for t in times:
+        yield eig_vecs @ (np.exp(-1j*t*eig_vals) * c)
 
 def expandbasis(a: np.ndarray) -> np.ndarray:
     """Expands 'a' to 2^n or 'qubit' basis for single photon.
@@ -46,7 +91,7 @@ def expandbasis(a: np.ndarray) -> np.ndarray:
     dim = 2**n
     
     #fill in expanded matrix
-    a_expanded = np.eye(dim, dtype='complex')
+    a_expanded = np.eye(dim, dtype=np.result_type(a, np.complex64)) #complex, in the precision of a
     for i in range(n):
         row = 1 << (n-1-i)
         for j in range(n):
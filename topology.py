@@ -0,0 +1,83 @@
+"""Cavity array topologies given as edge lists for multi_cavity.CavityArray
+
+An edge (i, j) couples cavities i and j with the hopping rate at the same
+position in model_params['hopping'].
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+from typing import List, Tuple, Union
+
+
+def chain_edges(num_cavities: int, periodic: bool=False) -> List[Tuple[int, int]]:
+    """Returns the nearest neighbor edges of a chain; a ring if periodic and more than 2 cavities"""
+    edges = [(i, i+1) for i in range(num_cavities-1)]
+    if periodic and num_cavities > 2:
+        edges.append((num_cavities-1, 0))
+    return edges
+
+def square_lattice(nx: int, ny: int, periodic: bool=False) -> List[Tuple[int, int]]:
+    """Returns the nearest neighbor edges of an nx by ny square lattice
+    Cavity (x, y) has index y*nx + x
+    Args:
+        nx, ny: number of cavities along each direction
+        periodic: bool, True for periodic boundary conditions in both directions
+    """
+    edges = []
+    for y in range(ny):
+        row = chain_edges(nx, periodic)
+        edges += [(y*nx + i, y*nx + j) for i, j in row]
+    for x in range(nx):
+        col = chain_edges(ny, periodic)
+        edges += [(i*nx + x, j*nx + x) for i, j in col]
+    return edges
+
+def parse_edges(edges, num_cavities: int) -> Tuple[List[Tuple[int, int]], Union[List[float], None]]:
+    """Helper function to validate input edges
+    Args:
+        edges: list or (E, 2) array of (i, j) pairs, list or (E, 3) array of (i, j, hopping)
+            triples, or a scipy.sparse adjacency matrix whose upper triangle gives the hopping
+            rates; arrays are always read as edges, wrap a dense adjacency matrix with
+            scipy.sparse.csr_matrix
+        num_cavities: number of cavities in the array
+    Returns:
+        (edges, hopping) where edges is a list of (i, j) pairs and hopping is the list
+        of rates given with the edges or None
+    """
+    hopping = None
+    if isinstance(edges, np.ndarray):
+        assert edges.ndim == 2 and edges.shape[1] in [2, 3], "edges array should have shape (E, 2) or (E, 3), got {}".format(edges.shape)
+        edges = edges.tolist()
+    if sp.issparse(edges):
+        assert edges.shape == (num_cavities, num_cavities), "adjacency matrix should have shape ({0}, {0}), got {1}".format(num_cavities, edges.shape)
+        adjacency = sp.triu(sp.coo_matrix(edges), k=1).tocoo()
+        edges = list(zip(adjacency.row.tolist(), adjacency.col.tolist()))
+        hopping = adjacency.data.tolist()
+    else:
+        edges = [tuple(edge) for edge in edges]
+        if len(edges) and len(edges[0]) == 3:
+            hopping = [edge[2] for edge in edges]
+        edges = [(int(edge[0]), int(edge[1])) for edge in edges]
+    for i, j in edges:
+        assert 0 <= i < num_cavities and 0 <= j < num_cavities and i != j, "Invalid edge ({}, {}) for {} cavities".format(i, j, num_cavities)
+    return edges, hopping
+
+def adjacency(num_cavities: int, edges: List[Tuple[int, int]], hopping=None) -> sp.csr_matrix:
+    """Returns the symmetric sparse adjacency matrix; weighted by hopping if given"""
+    weights = np.ones(len(edges)) if hopping is None else np.asarray(hopping)
+    rows = [i for i, j in edges] + [j for i, j in edges]
+    cols = [j for i, j in edges] + [i for i, j in edges]
+    return sp.csr_matrix((np.concatenate((weights, weights)), (rows, cols)), shape=(num_cavities, num_cavities))
+
+def rcm_order(num_cavities: int, edges: List[Tuple[int, int]]) -> np.ndarray:
+    """Reverse Cuthill-McKee ordering of the cavities
+    Returns:
+        permutation; the kth cavity of the reordered array is cavity order[k]
+    """
+    A = adjacency(num_cavities, edges)
+    return reverse_cuthill_mckee(A, symmetric_mode=True).astype(int)
+
+def bandwidth(edges: List[Tuple[int, int]]) -> int:
+    """Returns the max index distance |i-j| over the edges"""
+    return max([abs(i - j) for i, j in edges], default=0)
@@ -0,0 +1,166 @@
+"""Monte Carlo quantum trajectories using the effective (no-jump) Hamiltonian
+
+Between jumps a trajectory evolves under the non-Hermitian hamiltonian of its
+excitation sector; cavity and emitter decay jumps move it into the sector with
+one fewer excitation.
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import sectors
+
+#sector data shared by all trajectories run in a process
+_sectors = None
+
+#bisection steps used to locate a jump time within a time step
+BISECT_STEPS = 50
+
+
+def mcsolve(num_cavities, num_photons, model_params, psi0, times, periodic=False, ntraj=1000, processes=None, chunksize=100, seed=None, **kwargs):
+    """Monte Carlo wave function solver
+    Args:
+        num_cavities: number of cavities in the array
+        num_photons: number of excitations in the initial state
+        model_params: dict of model params, see multi_cavity.CavityArray
+        psi0: initial state; basis state as list of quanta locs or state vector
+            in the num_photons sector
+        times: increasing list of times the observables are recorded at
+        periodic: bool, True for periodic boundary conditions
+        ntraj: number of trajectories
+        processes: number of worker processes; 1 runs in this process,
+            None uses every cpu
+        chunksize: number of trajectories per task
+        seed: seed for numpy.random.SeedSequence; every task gets an independent stream
+        kwargs: keyword args for multi_cavity.CavityArray, e.g. edges, reorder or precision;
+            with reorder the cavities are relabeled, see CavityArray.site_order
+    Returns:
+        dict containing
+            'times': the times
+            'photon', 'photon_err': mean and standard error of the photon number
+                in each cavity, shape (len(times), num_cavities)
+            'excite', 'excite_err': same for the emitter excitations in each cavity
+            'ntraj': number of trajectories
+    """
+    times = np.asarray(times, dtype=float)
+    cavity_arrays = sectors.build_sectors(num_cavities, num_photons, model_params, periodic, **kwargs)
+    data = sector_data(cavity_arrays)
+    if isinstance(psi0, list):
+        psi0 = cavity_arrays[-1].states.tovec(psi0)
+    psi0 = np.asarray(psi0, dtype=data[-1]['vecs'].dtype).ravel()
+    psi0 = psi0 / np.linalg.norm(psi0)
+
+    #split the trajectories into tasks with independent random streams
+    sizes = [chunksize] * (ntraj // chunksize)
+    if ntraj % chunksize:
+        sizes.append(ntraj % chunksize)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(psi0, num_photons, times, size, s) for size, s in zip(sizes, seeds)]
+
+    if processes == 1:
+        _init(data)
+        results = [_run_chunk(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init, initargs=(data,)) as pool:
+            results = list(pool.map(_run_chunk, *zip(*args)))
+
+    totals = [np.sum(x, axis=0) for x in zip(*results)]
+    result = {'times': times, 'ntraj': ntraj}
+    for key, s1, s2 in zip(['photon', 'excite'], totals[::2], totals[1::2]):
+        mean = s1 / ntraj
+        var = np.maximum(s2 / ntraj - mean**2, 0)
+        result[key] = mean
+        result[key + '_err'] = np.sqrt(var / max(ntraj-1, 1))
+    return result
+
+def sector_data(cavity_arrays):
+    """Precomputes everything a trajectory needs in each sector
+    Args:
+        cavity_arrays: list of CavityArray objects from sectors.build_sectors
+    Returns:
+        list of dicts containing the eigendecomposition of the hamiltonian ('vals',
+        'vecs', 'inv') in the dtype of the cavity arrays, the 'photon' and 'excite'
+        number tables and the decay 'jumps' as (rate, J) pairs into the sector below
+    """
+    data = []
+    for n, cavity_array in enumerate(cavity_arrays):
+        eig_vals, eig_vecs = np.linalg.eig(cavity_array.hamiltonian_matrix().toarray())
+        photon, excite = metrics.cavity_numbers(cavity_array)
+        jumps = []
+        if n > 0:
+            jumps = [(rate, J.astype(eig_vecs.dtype)) for loc, rate, J in sectors.jump_operators(cavity_array, cavity_arrays[n-1])]
+        data.append({'vals': eig_vals,
+                     'vecs': eig_vecs,
+                     'inv': np.linalg.inv(eig_vecs),
+                     'photon': photon,
+                     'excite': excite,
+                     'jumps': jumps})
+    return data
+
+def _init(data):
+    """Process initializer storing the sector data"""
+    global _sectors
+    _sectors = data
+
+def _run_chunk(psi0, n, times, ntraj, seed):
+    """Runs ntraj trajectories
+    Returns:
+        sum and sum of squares over trajectories of the photon and excite expectation values
+    """
+    rng = np.random.default_rng(seed)
+    num_cavities = _sectors[0]['photon'].shape[1]
+    sums = [np.zeros((len(times), num_cavities)) for _ in range(4)]
+    for _ in range(ntraj):
+        photon, excite = _trajectory(psi0, n, times, rng)
+        sums[0] += photon
+        sums[1] += photon**2
+        sums[2] += excite
+        sums[3] += excite**2
+    return sums
+
+def _trajectory(psi, n, times, rng):
+    """Single quantum trajectory
+    The unnormalized state decays under the effective hamiltonian until its norm^2
+    falls below a uniform random number; the jump time is then found by bisection
+    Returns:
+        photon and excite expectation values at each time
+    """
+    num_cavities = _sectors[0]['photon'].shape[1]
+    photon = np.zeros((len(times), num_cavities))
+    excite = np.zeros((len(times), num_cavities))
+    r = rng.random()
+    t_prev = times[0]
+    for k, t in enumerate(times):
+        while True:
+            sector = _sectors[n]
+            c = sector['inv'] @ psi
+            evolve = lambda tau: sector['vecs'] @ (np.exp(-1j*tau*sector['vals']) * c)
+            norm = lambda v: np.vdot(v, v).real
+            psi_t = evolve(t - t_prev)
+            if not sector['jumps'] or norm(psi_t) > r:
+                break
+
+            #locate the jump time
+            lo, hi = 0, t - t_prev
+            for _ in range(BISECT_STEPS):
+                mid = 0.5*(lo + hi)
+                if norm(evolve(mid)) > r:
+                    lo = mid
+                else:
+                    hi = mid
+            psi_jump = evolve(hi)
+
+            #choose the decay channel
+            new_states = [J @ psi_jump for rate, J in sector['jumps']]
+            weights = np.array([rate * norm(v) for (rate, J), v in zip(sector['jumps'], new_states)])
+            channel = rng.choice(len(weights), p=weights/np.sum(weights))
+            psi = new_states[channel] / np.sqrt(norm(new_states[channel]))
+            n -= 1
+            t_prev += hi
+            r = rng.random()
+        psi, t_prev = psi_t, t
+        prob = np.abs(psi)**2 / norm(psi)
+        photon[k] = prob @ sector['photon']
+        excite[k] = prob @ sector['excite']
+    return photon, excite
@@ -1,4 +1,6 @@
 import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg
 import inspect
 from typing import List, Tuple, Dict, Union
 
@@ -26,6 +28,19 @@ def sort_eigenstates(eig_vals: np.ndarray, eig_vecs: np.ndarray, sortby: str='en
     return np.array(_eig_vals), np.array(_eig_vecs).T
 
 
+def residuals(hamiltonian: np.ndarray, eig_vals: np.ndarray, eig_vecs: np.ndarray) -> np.ndarray:
+    """Returns the relative residual |Hv - Ev|/(|H||v|) of each eigenpair using the Frobenius
+    norm of H; computed in double precision"""
+    if sp.issparse(hamiltonian):
+        H = hamiltonian.astype(np.complex128)
+        norm = sp.linalg.norm(H)
+    else:
+        H = np.asarray(hamiltonian, dtype=np.complex128)
+        norm = np.linalg.norm(H)
+    V = np.asarray(eig_vecs, dtype=np.complex128)
+    r = np.linalg.norm(H @ V - V * np.asarray(eig_vals, dtype=np.complex128), axis=0)
+    return r / (norm * np.linalg.norm(V, axis=0))
+
 
 def kwargs_sep(fcn, kwargs):
     """Used to separate kwargs for multiple different functions